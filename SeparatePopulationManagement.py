@@ -1,34 +1,90 @@
 import numpy as np
-from magic_square_chromosome import MagicSquareChromosome
+from magic_square_chromosome import MagicSquareChromosome, random_boards
 from most_perfect_magic_square_chromosome import MostPerfectMagicSquareChromosome
+from population_tensor import pack_population, population_fitness
+from selection import check_selection, select_parent_pairs
+from migration import check_migration, migration_targets, select_emigrants
+from crossover import check_crossover, cross_over_pairs
+from profiling import PROFILER
+from checkpoint import save_checkpoint
+from local_search import check_local_search, optimize_population
+from symmetry import SymmetryIndex
+from streaming import run_manager
+from adaptive import AdaptiveMutation, replace_worst
 import random
 
 class IslandPopulationManagement:
-    def __init__(self, N, size, state=0, most_state=False, mutation_rate=0.1, elitism=0.1):
-        # Ensure population size is divisible by 4 for equal island sizes
-        if size % 4 != 0:
-            size = ((size // 4) + 1) * 4  # Round up to nearest multiple of 4
-        
-        self.island_size = size // 4
-        self.total_size = size
+    def __init__(self, N, size, state=0, most_state=False, mutation_rate=0.1, elitism=0.1, engine="object",
+                 selection="roulette", tournament_size=3, islands=None, num_islands=4,
+                 topology="shuffle", emigrant_policy="worst", migration_interval=100, migration_rate=1/6,
+                 crossover="uniform", checkpoint_path=None, checkpoint_every=0, local_search="greedy",
+                 local_search_budget=None, deduplicate=False, adaptive=False):
+        if engine not in ("object", "tensor"):
+            raise ValueError(f"Unknown engine {engine!r}, expected 'object' or 'tensor'.")
+        check_selection(selection)
+        check_migration(num_islands, topology, emigrant_policy)
+        check_crossover(crossover)
+        check_local_search(local_search)
+        self.N = N
         self.most_state = most_state
-        
-        # Create 4 islands
-        self.islands = []
-        for i in range(4):
-            if self.most_state:
-                island_pop = [MostPerfectMagicSquareChromosome(N) for _ in range(self.island_size)]
-            else:
-                island_pop = [MagicSquareChromosome(N) for _ in range(self.island_size)]
-            self.islands.append(island_pop)
+        if islands is not None:
+            # Adopt ready-made islands (e.g. the single island of a worker process)
+            self.islands = [list(island) for island in islands]
+            self.island_size = len(self.islands[0])
+            size = sum(len(island) for island in self.islands)
+        else:
+            # Ensure population size is divisible by the island count for equal island sizes
+            if size % num_islands != 0:
+                size = ((size // num_islands) + 1) * num_islands  # Round up to nearest multiple
+            self.island_size = size // num_islands
+
+            # Create the islands, every board drawn at once
+            chromosome_cls = MostPerfectMagicSquareChromosome if self.most_state else MagicSquareChromosome
+            boards = random_boards(size, N).reshape(num_islands, self.island_size, N, N)
+            self.islands = [[chromosome_cls(N, board) for board in island_boards] for island_boards in boards]
+        self.total_size = size
         
         self.generation = 0
+        # individuals created so far, the unit of an evaluation budget
+        self.evaluations = size
         self.state = state
         self.mutation_rate = mutation_rate
         self.elitism = elitism
         self.size = size
-        self.migration_interval = 100
-        self.migration_rate = 1/6  # 1/6 of population migrates
+        self.migration_interval = migration_interval
+        self.migration_rate = migration_rate  # share of each island that migrates
+        # "shuffle", "ring", "torus", "full" or "random", see migration.py
+        self.topology = topology
+        # which chromosomes leave: "worst", "best" or "random"
+        self.emigrant_policy = emigrant_policy
+        self.migration_epoch = 0
+
+        # "tensor" keeps each island in its own (P, n, n) array
+        self.engine = engine
+        self.island_boards = [None] * len(self.islands)
+        for i in range(len(self.islands)):
+            self._pack_island(i)
+
+        # "roulette", "sus" or "tournament"
+        self.selection = selection
+        self.tournament_size = tournament_size
+        # "uniform", "pmx" or "cycle"
+        self.crossover = crossover
+        # "greedy", "steepest", "tabu" or "anneal" for states 1 and 2, with
+        # an optional budget of swap evaluations per board, see local_search.py
+        self.local_search = local_search
+        self.local_search_budget = local_search_budget
+        # replace duplicates and symmetric twins across all islands every
+        # generation, with one fitness memo for all of them, see symmetry.py
+        self.deduplicate = deduplicate
+        self.symmetry_index = SymmetryIndex() if deduplicate else None
+        # raise the mutation intensity and restart part of every island
+        # when the run stagnates, see adaptive.py
+        self.adaptive = adaptive
+        self.adaptation = AdaptiveMutation() if adaptive else None
+        # save_checkpoint() to checkpoint_path every checkpoint_every generations
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
     
     # getters
     def get_population(self):
@@ -44,24 +100,49 @@ class IslandPopulationManagement:
     def get_generation(self):
         return self.generation
     
+    def get_island_boards(self, island_idx):
+        """Returns the (P, n, n) array of an island, or None in object mode"""
+        return self.island_boards[island_idx]
+
+    def get_island_fitnesses(self, island_idx):
+        """Returns the fitness of every chromosome on an island as one array"""
+        return population_fitness(self.islands[island_idx], self.island_boards[island_idx])
+
+    def get_boards(self):
+        """Returns the boards of the flattened population as one array, or None in object mode"""
+        if self.engine != "tensor":
+            return None
+        return np.concatenate(self.island_boards)
+
+    def get_fitnesses(self):
+        """Returns the fitness of the flattened population as one array"""
+        return np.concatenate([self.get_island_fitnesses(i) for i in range(len(self.islands))])
+
+    def _pack_island(self, island_idx):
+        """Rebuild the board array of an island after its members changed"""
+        if self.engine == "tensor":
+            self.island_boards[island_idx] = pack_population(self.islands[island_idx])
+        else:
+            self.island_boards[island_idx] = None
+
     def get_best_chromosomes(self, rate=0.1):
         """Get best chromosomes from entire population"""
         all_pop = self.get_population()
-        sorted_pop = sorted(all_pop, key=lambda c: c.get_fitness())
-        k = max(1, int(rate * len(sorted_pop)))
-        return sorted_pop[:k]
+        order = np.argsort(self.get_fitnesses(), kind="stable")
+        k = max(1, int(rate * len(order)))
+        return [all_pop[i] for i in order[:k]]
     
     def get_best_chromosomes_from_island(self, island_idx, rate=0.1):
         """Get best chromosomes from a specific island"""
         island = self.islands[island_idx]
-        sorted_pop = sorted(island, key=lambda c: c.get_fitness())
-        k = max(1, int(rate * len(sorted_pop)))
-        return sorted_pop[:k]
+        order = np.argsort(self.get_island_fitnesses(island_idx), kind="stable")
+        k = max(1, int(rate * len(order)))
+        return [island[i] for i in order[:k]]
     
     def select_parent(self, island_idx):
         """Select parent from specific island using roulette wheel"""
         island = self.islands[island_idx]
-        fitnesses = np.array([c.get_fitness() for c in island], dtype=float)
+        fitnesses = self.get_island_fitnesses(island_idx).astype(float)
         max_fitness = np.max(fitnesses)
         fitnesses = max_fitness - fitnesses
         total = fitnesses.sum()
@@ -73,108 +154,175 @@ class IslandPopulationManagement:
             
         idx = np.random.choice(len(island), p=probs)
         return island[idx]
+
+    def select_parents(self, island_idx, num_pairs, fitnesses=None):
+        """Draw all parent pairs of an island from one fitness vector, by default the island's own"""
+        island = self.islands[island_idx]
+        if fitnesses is None:
+            fitnesses = self.get_island_fitnesses(island_idx)
+        pairs = select_parent_pairs(fitnesses, num_pairs, self.selection, self.tournament_size)
+        return [(island[i], island[j]) for i, j in pairs]
     
     def migrate_population(self):
-        """Migrate 1/6 of population between islands every migration_interval generations"""
+        """Move migration_rate of every island along the topology every migration_interval generations"""
         if self.generation % self.migration_interval != 0:
             return
         
-        migration_size = max(1, int(self.island_size * self.migration_rate))
-        
-        # Get migrants from each island (worst performers)
-        migrants = []
-        for i in range(4):
-            island = self.islands[i]
-            sorted_island = sorted(island, key=lambda c: c.get_fitness(), reverse=True)  # worst first
-            island_migrants = sorted_island[:migration_size]
-            migrants.extend(island_migrants)
-            
-            # Remove migrants from original island
-            for migrant in island_migrants:
-                island.remove(migrant)
-        
-        # Redistribute migrants randomly across islands
+        migration_size = self.get_migration_size()
+        outgoing = [self._take_emigrants(i, migration_size) for i in range(len(self.islands))]
+        for i, incoming in enumerate(self._route_migrants(outgoing)):
+            self.islands[i].extend(incoming)
+            self._pack_island(i)
+
+    def get_migration_size(self):
+        """Number of chromosomes each island sends away at a migration"""
+        return max(1, int(self.island_size * self.migration_rate))
+
+    def _take_emigrants(self, island_idx, count):
+        """Remove and return the emigrants of an island, chosen by index without list removals"""
+        island = self.islands[island_idx]
+        chosen = select_emigrants(self.get_island_fitnesses(island_idx), count, self.emigrant_policy)
+        leaving = np.zeros(len(island), dtype=bool)
+        leaving[chosen] = True
+        self.islands[island_idx] = [chrom for chrom, gone in zip(island, leaving) if not gone]
+        self.island_boards[island_idx] = None
+        return [island[i] for i in chosen]
+
+    def _route_migrants(self, outgoing):
+        """Turn the emigrants of every island into the immigrants of every island"""
+        if self.topology == "shuffle":
+            incoming = self._distribute_migrants([m for migrants in outgoing for m in migrants])
+        else:
+            targets = migration_targets(self.topology, len(self.islands), self.migration_epoch)
+            incoming = [[] for _ in self.islands]
+            for source, target in enumerate(targets):
+                incoming[target].extend(outgoing[source])
+        self.migration_epoch += 1
+        return incoming
+
+    def _distribute_migrants(self, migrants):
+        """Shuffle the pooled migrants and deal them out round-robin, one list per island"""
         random.shuffle(migrants)
+        incoming = [[] for _ in self.islands]
         for i, migrant in enumerate(migrants):
-            target_island = i % 4
-            self.islands[target_island].append(migrant)
+            incoming[i % len(self.islands)].append(migrant)
+        return incoming
     
     def evaluate_population(self):
         """Evaluate each island separately, then handle migration"""
         # Process each island
-        for island_idx in range(4):
+        for island_idx in range(len(self.islands)):
             self._evaluate_island(island_idx)
         
         # Handle migration
-        self.migrate_population()
+        with PROFILER.phase("migration"):
+            self.migrate_population()
+
+        self._deduplicate()
+        self._adapt()
         
         self.generation += 1
+        if self.checkpoint_every and self.generation % self.checkpoint_every == 0:
+            with PROFILER.phase("checkpoint"):
+                save_checkpoint(self, self.checkpoint_path)
+        if PROFILER.enabled:
+            PROFILER.end_generation(self.generation)
+
+    def run(self, stop=None, diversity=True):
+        """
+        Evolves one generation per step and yields its statistics until a
+        stop condition fires, see streaming.run_manager.
+        """
+        return run_manager(self, stop, diversity)
     
+    def _deduplicate(self):
+        """Replace duplicates and symmetric twins across all islands, if enabled"""
+        if self.symmetry_index is not None:
+            # islands are packed, so the in-place mutations keep their boards current
+            with PROFILER.phase("deduplicate"):
+                self.symmetry_index.deduplicate(self.get_population())
+
+    def _mutation_intensity(self):
+        """Returns the mutation rate and swaps per mutation (None: the default) of this generation"""
+        if self.adaptation is None:
+            return self.mutation_rate, None
+        return self.adaptation.mutation_rate(self.mutation_rate), self.adaptation.mutation_swaps(self.N)
+
+    def _adapt(self):
+        """
+        Report the generation to the adaptive controller, which watches the
+        whole population; a restart or injection then hits every island.
+        """
+        if self.adaptation is None:
+            return
+        action = self.adaptation.observe(self.get_fitnesses(), self.get_population(), self.get_boards())
+        if action is None:
+            return
+        with PROFILER.phase("adaptation"):
+            for island_idx, island in enumerate(self.islands):
+                count = self.adaptation.replacement_count(action, len(island))
+                self.islands[island_idx] = replace_worst(island, self.get_island_fitnesses(island_idx), count)
+                self._pack_island(island_idx)
+                self.evaluations += count
+
     def _evaluate_island(self, island_idx):
         """Evaluate a single island (same logic as original populationManagement)"""
         island = self.islands[island_idx]
         new_island = []
-        
+
         if self.state != 2:
-            elite = self.get_best_chromosomes_from_island(island_idx, self.elitism)
-        else:
-            elite = []
+            with PROFILER.phase("elitism"):
+                new_island.extend(self.get_best_chromosomes_from_island(island_idx, self.elitism))
 
-        new_island = []
-        for chrom in elite:
-            new_island.append(chrom)
-        
         # regular/darwin/lamarck state
+        learned_fitnesses = None
         if self.state != 0:
-            copy_island = [chrom.clone() for chrom in island]
-            for i in range(len(copy_island)):
-                island[i].local_optimize()
-            
-            if self.state == 2:
-                # elitism for lamarck
-                lam_elite = self.get_best_chromosomes_from_island(island_idx, self.elitism)
-                for chrom in lam_elite:
-                    new_island.append(chrom)
-        
+            # darwin: the learned fitness only steers selection,
+            # lamarck: the learned boards are inherited as well
+            learned_fitnesses = optimize_population(island, self.island_boards[island_idx],
+                                                    write_back=(self.state == 2), method=self.local_search,
+                                                    budget=self.local_search_budget)
+        if self.state == 2:
+            # elitism for lamarck
+            with PROFILER.phase("elitism"):
+                new_island.extend(self.get_best_chromosomes_from_island(island_idx, self.elitism))
+
         # crossover
-        parents = []
         num_children = self.island_size - len(new_island)
-        
-        for i in range(num_children):
-            parent1 = self.select_parent(island_idx)
-            parent2 = self.select_parent(island_idx)
-            parents.append((parent1, parent2))
-        
-        if self.state == 1:
-            self.islands[island_idx] = copy_island
-        
-        for i in range(num_children):
-            parent1, parent2 = parents[i]
-            child = parent1.cross_over(parent2)
-            new_island.append(child)
-        
-        # mutation
-        for i in range(len(new_island)):
-            if random.random() < self.mutation_rate:
-                new_island[i].mutate()
-        
+        with PROFILER.phase("selection"):
+            parents = self.select_parents(island_idx, num_children, learned_fitnesses)
+
+        # all children of the island in one batch
+        with PROFILER.phase("crossover"):
+            children = cross_over_pairs(parents, self.crossover)
+
+        # mutation; the elites are carried over unchanged
+        mutation_rate, swaps = self._mutation_intensity()
+        with PROFILER.phase("mutation"):
+            for child in children:
+                if random.random() < mutation_rate:
+                    child.mutate(swaps)
+        new_island.extend(children)
+        self.evaluations += len(children)
+
         # update island
         self.islands[island_idx] = new_island
+        with PROFILER.phase("pack"):
+            self._pack_island(island_idx)
     
     def get_island_best_fitness(self, island_idx):
         """Get best fitness from a specific island"""
-        island = self.islands[island_idx]
-        return min(chrom.get_fitness() for chrom in island)
+        return self.get_island_fitnesses(island_idx).min()
     
     def get_overall_best_fitness(self):
         """Get best fitness from entire population"""
-        return min(self.get_island_best_fitness(i) for i in range(4))
+        return min(self.get_island_best_fitness(i) for i in range(len(self.islands)))
     
     def print_island_stats(self):
         """Print statistics for each island"""
         print(f"Generation {self.generation}:")
-        for i in range(4):
+        for i in range(len(self.islands)):
             best_fitness = self.get_island_best_fitness(i)
-            avg_fitness = np.mean([chrom.get_fitness() for chrom in self.islands[i]])
+            avg_fitness = np.mean(self.get_island_fitnesses(i))
             print(f"  Island {i}: Best={best_fitness:.2f}, Avg={avg_fitness:.2f}, Size={len(self.islands[i])}")
         print(f"  Overall Best: {self.get_overall_best_fitness():.2f}")
\ No newline at end of file
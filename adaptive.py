@@ -0,0 +1,143 @@
+import numpy as np
+
+from magic_square_chromosome import board_dtype, random_boards
+from population_tensor import population_diversity
+
+
+class AdaptiveMutation:
+    """
+    Stagnation-aware control of the mutation intensity with restarts.
+
+    A manager built with adaptive=True reports every generation to
+    observe(). While neither the best nor the mean fitness improves the
+    stall counter grows; every `patience` stalled generations the
+    escalation level goes up by one, which multiplies both the mutation
+    rate and the number of swaps per mutation by `boost`. Stalling at
+    `max_level` asks the manager for a restart that keeps only its
+    `restart_keep` best chromosomes (none by default: kept elites pull the
+    fresh boards straight back into the same local optimum). A population
+    whose diversity (see population_diversity) falls below `min_diversity`
+    gets its worst `inject_rate` share replaced by fresh random boards. A
+    new best fitness drops straight back to level 0, i.e. to the manager's
+    own settings.
+
+    Because a restart throws away the best board found so far, the
+    controller keeps a copy of it (archive_board, archive_fitness), which is
+    what a run should report when the population has fallen behind it.
+    """
+
+    def __init__(self, patience=30, max_level=3, boost=2.0, min_diversity=0.1, inject_rate=0.1, restart_keep=0):
+        self.patience = patience
+        self.max_level = max_level
+        self.boost = boost
+        self.min_diversity = min_diversity
+        self.inject_rate = inject_rate
+        self.restart_keep = restart_keep
+        self.level = 0
+        self.stall = 0
+        self.best = None
+        self.best_mean = None
+        self.restarts = 0
+        self.injections = 0
+        self.archive_fitness = None
+        self.archive_board = None
+
+    def mutation_rate(self, base_rate):
+        return min(1.0, base_rate * self.boost ** self.level)
+
+    def mutation_swaps(self, n):
+        """Swaps per mutation, the chromosome's own max(1, n // 2) at level 0"""
+        return min(n * n, int(max(1, n // 2) * self.boost ** self.level))
+
+    def snapshot(self):
+        """Returns the controller's progress as a JSON-ready dict, see restore()"""
+        return {
+            "level": self.level,
+            "stall": self.stall,
+            "best": None if self.best is None else self.best.item(),
+            "best_mean": None if self.best_mean is None else float(self.best_mean),
+            "restarts": self.restarts,
+            "injections": self.injections,
+            "archive_fitness": self.archive_fitness,
+            "archive_board": None if self.archive_board is None else self.archive_board.tolist(),
+        }
+
+    def restore(self, snapshot):
+        """Continues from the progress recorded by snapshot()"""
+        self.level = snapshot["level"]
+        self.stall = snapshot["stall"]
+        self.best = None if snapshot["best"] is None else np.int64(snapshot["best"])
+        self.best_mean = None if snapshot["best_mean"] is None else np.float64(snapshot["best_mean"])
+        self.restarts = snapshot["restarts"]
+        self.injections = snapshot["injections"]
+        self.archive_fitness = snapshot["archive_fitness"]
+        board = snapshot["archive_board"]
+        self.archive_board = None if board is None else np.array(board, dtype=board_dtype(len(board)))
+
+    def archive(self, fitness, board):
+        """Keeps a copy of board if it beats the best board archived so far"""
+        if self.archive_fitness is None or fitness < self.archive_fitness:
+            self.archive_fitness = fitness
+            self.archive_board = np.array(board)
+
+    def observe(self, fitnesses, population, boards=None):
+        """
+        Records one generation and returns what the manager should do:
+        None, "inject" (replace the worst inject_rate share) or "restart"
+        (replace all but the restart_keep best). boards is the packed (P, n, n) array
+        if there is one, otherwise it is stacked from the population when
+        the diversity check needs it.
+        """
+        best_idx = int(fitnesses.argmin())
+        best, mean = fitnesses[best_idx], fitnesses.mean()
+        self.archive(best.item(), population[best_idx].get_square())
+        if self.best is None or best < self.best:
+            self.best = best
+            self.best_mean = mean
+            self.level = 0
+            self.stall = 0
+        elif mean < self.best_mean:
+            self.best_mean = mean
+            self.stall = 0
+        else:
+            self.stall += 1
+
+        if self.stall >= self.patience:
+            self.stall = 0
+            if self.level < self.max_level:
+                self.level += 1
+            else:
+                # the fresh population sets the fitness to beat from here on
+                self.level = 0
+                self.best = None
+                self.restarts += 1
+                return "restart"
+
+        if self.min_diversity > 0:
+            if boards is None:
+                boards = np.stack([chrom.square for chrom in population])
+            if population_diversity(boards) < self.min_diversity:
+                self.injections += 1
+                return "inject"
+        return None
+
+    def replacement_count(self, action, size):
+        """Number of chromosomes an action replaces in a population of size"""
+        if action == "restart":
+            return size - min(self.restart_keep, size)
+        return max(1, int(self.inject_rate * size))
+
+
+def replace_worst(population, fitnesses, count):
+    """
+    Returns a copy of the population whose count worst chromosomes are
+    replaced by chromosomes on fresh random boards.
+    """
+    population = list(population)
+    if count <= 0:
+        return population
+    chromosome_cls, n = type(population[0]), population[0].n
+    worst = np.argsort(fitnesses, kind="stable")[len(population) - count:]
+    for i, board in zip(worst, random_boards(count, n)):
+        population[i] = chromosome_cls(n, board)
+    return population
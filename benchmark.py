@@ -0,0 +1,284 @@
+"""
+Benchmark suite for the magic square GA.
+
+    python benchmark.py                          # run and print JSON
+    python benchmark.py --output results.json    # also write the results
+    python benchmark.py --save-baseline          # refresh benchmark_baseline.json
+    python benchmark.py --compare                # flag regressions against it
+
+Three groups are measured with fixed seeds:
+  micro/...            seconds per call of get_fitness, cross_over, mutate,
+                       local_optimize and fix_missing_numbers for each n
+  throughput/...       generations per second of a fixed-size run
+  time_to_solution/... median seconds until a perfect square is found
+The end-to-end groups cover populationManagement and
+IslandPopulationManagement x states 0/1/2 x regular/most-perfect.
+
+Timings only compare across runs of the same machine and load, so every
+report also times a fixed reference kernel. --compare scales the baseline
+by how much slower or faster that kernel ran here, warns when the
+baseline was recorded on a different machine and refuses a baseline
+recorded with other --quick/--engine/--adaptive settings. Exits with 1
+when --compare finds a regression and with 2 when it refuses.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import timeit
+
+import numpy as np
+
+from magic_square_chromosome import MagicSquareChromosome
+from most_perfect_magic_square_chromosome import MostPerfectMagicSquareChromosome
+from population_management import populationManagement
+from SeparatePopulationManagement import IslandPopulationManagement
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+MICRO_SIZES = (3, 4, 5, 8, 16)
+MANAGERS = {"population": populationManagement, "islands": IslandPopulationManagement}
+STATES = {0: "regular", 1: "darwinian", 2: "lamarckian"}
+# (n, population) per square kind for the end-to-end runs
+THROUGHPUT_SETUP = {"regular": (8, 400), "most_perfect": (8, 400)}
+SOLUTION_SETUP = {"regular": (3, 100), "most_perfect": (4, 200)}
+
+
+def seed_all(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def _result(value, unit, better):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def time_per_call(fn, number, repeat=5):
+    """Best-of-repeat seconds per call of fn"""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def reference_seconds(number=50):
+    """Seconds per call of a fixed mix of numpy and pure-Python work, the yardstick between runs"""
+    values = np.random.default_rng(0).random(4096)
+
+    def kernel():
+        np.sort(values)
+        sum(i * i for i in range(2000))
+
+    return time_per_call(kernel, number)
+
+
+def machine_meta():
+    """Describes the machine and interpreter a report was recorded on"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def micro_benchmarks(sizes=MICRO_SIZES, number=200):
+    """Seconds per call of the chromosome operators for every n"""
+    results = {}
+    for n in sizes:
+        kinds = [("regular", MagicSquareChromosome)]
+        if n % 4 == 0:
+            kinds.append(("most_perfect", MostPerfectMagicSquareChromosome))
+        for kind, chromosome_cls in kinds:
+            seed_all(n)
+            chrom, other = chromosome_cls(n), chromosome_cls(n)
+            start = chrom.square.copy()
+            # a board with duplicates, restored before every repair
+            broken = np.where(np.random.random((n, n)) < 0.5, chrom.square, other.square)
+            damaged = chromosome_cls(n, broken.copy())
+
+            def fitness():
+                chrom.invalidate_fitness()
+                chrom.get_fitness()
+
+            def optimize():
+                # local_optimize improves the board in place, so always start from the same one
+                chrom.square = start.copy()
+                chrom.local_optimize()
+
+            def fix():
+                damaged.square[...] = broken
+                damaged.fix_missing_numbers()
+
+            operators = {
+                "get_fitness": fitness,
+                "cross_over": lambda: chrom.cross_over(other),
+                "mutate": chrom.mutate,
+                "local_optimize": optimize,
+                "fix_missing_numbers": fix,
+            }
+            for name, fn in operators.items():
+                results[f"micro/{name}/{kind}/n={n}"] = _result(time_per_call(fn, number), "s/call", "lower")
+    return results
+
+
+def _config_name(manager_name, state, kind):
+    return f"{manager_name}/{STATES[state]}/{kind}"
+
+
+def _build(manager_name, n, size, state, kind, engine, adaptive=False):
+    return MANAGERS[manager_name](n, size, state=state, most_state=(kind == "most_perfect"), engine=engine,
+                                  adaptive=adaptive)
+
+
+def throughput_benchmarks(generations=20, engine="tensor", seed=0, adaptive=False):
+    """Generations per second of a fixed-length run for every configuration"""
+    results = {}
+    for manager_name in MANAGERS:
+        for state in STATES:
+            for kind, (n, size) in THROUGHPUT_SETUP.items():
+                seed_all(seed)
+                manager = _build(manager_name, n, size, state, kind, engine, adaptive)
+                start = time.perf_counter()
+                for _ in range(generations):
+                    manager.evaluate_population()
+                elapsed = time.perf_counter() - start
+                name = f"throughput/{_config_name(manager_name, state, kind)}/n={n}/pop={size}"
+                results[name] = _result(generations / elapsed, "gen/s", "higher")
+    return results
+
+
+def time_to_solution(manager, max_gens):
+    """Seconds until the manager holds a perfect square, or None"""
+    start = time.perf_counter()
+    for _ in range(max_gens):
+        manager.evaluate_population()
+        if manager.get_fitnesses().min() == 0:
+            return time.perf_counter() - start
+    return None
+
+
+def solution_benchmarks(seeds=range(5), max_gens=500, engine="tensor", adaptive=False):
+    """Median time-to-solution over fixed seeds for every configuration"""
+    results = {}
+    for manager_name in MANAGERS:
+        for state in STATES:
+            for kind, (n, size) in SOLUTION_SETUP.items():
+                times = []
+                for seed in seeds:
+                    seed_all(seed)
+                    manager = _build(manager_name, n, size, state, kind, engine, adaptive)
+                    elapsed = time_to_solution(manager, max_gens)
+                    times.append(float("inf") if elapsed is None else elapsed)
+                median = statistics.median(times)
+                name = f"time_to_solution/{_config_name(manager_name, state, kind)}/n={n}/pop={size}"
+                # an unsolved median is reported as null and counts as a regression
+                results[name] = _result(None if median == float("inf") else median, "s", "lower")
+                results[name]["solved"] = sum(t != float("inf") for t in times) / len(times)
+    return results
+
+
+def compare(results, baseline, tolerance, scale=1.0):
+    """
+    Returns a list of (name, baseline value, current value) for every
+    benchmark that got worse than the baseline by more than tolerance.
+    scale is how many times slower this machine runs than the baseline's
+    (see reference_seconds); the baseline values are adjusted by it first.
+    """
+    regressions = []
+    for name, entry in results.items():
+        reference = baseline.get(name)
+        if reference is None or reference["value"] is None:
+            continue
+        value, ref = entry["value"], reference["value"]
+        if value is None:
+            worse = True
+        elif entry["better"] == "lower":
+            worse = value > ref * scale * (1 + tolerance)
+        else:
+            worse = value < ref / scale / (1 + tolerance)
+        if worse:
+            regressions.append((name, ref, value))
+    return regressions
+
+
+def run_suite(quick=False, engine="tensor", adaptive=False):
+    """Runs every benchmark group and returns the combined results"""
+    results = {}
+    results.update(micro_benchmarks(number=50 if quick else 200))
+    results.update(throughput_benchmarks(generations=5 if quick else 20, engine=engine, adaptive=adaptive))
+    results.update(solution_benchmarks(seeds=range(3 if quick else 5), engine=engine, adaptive=adaptive))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions, for a fast sanity run")
+    parser.add_argument("--engine", choices=["object", "tensor"], default="tensor")
+    parser.add_argument("--adaptive", action="store_true", help="run the end-to-end groups with adaptive=True")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare against or save to")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="flag regressions against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="relative slowdown tolerated before a result counts as a regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        # checked up front, a run in another mode is not worth timing
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        meta = baseline["meta"]
+        if (meta.get("quick") != args.quick or meta.get("engine") != args.engine
+                or meta.get("adaptive", False) != args.adaptive):
+            print(f"error: {args.baseline} was recorded with different --quick/--engine/--adaptive settings; "
+                  f"record a matching baseline with --save-baseline --baseline PATH", file=sys.stderr)
+            return 2
+
+    # timed before and after the suite, the faster of both is the least disturbed by other load
+    reference = reference_seconds()
+    report = {
+        "meta": {
+            **machine_meta(),
+            "engine": args.engine,
+            "quick": args.quick,
+            "adaptive": args.adaptive,
+        },
+        "results": run_suite(args.quick, args.engine, args.adaptive),
+    }
+    report["meta"]["reference_seconds"] = min(reference, reference_seconds())
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(text + "\n")
+
+    if args.compare:
+        different = [key for key, value in machine_meta().items() if meta.get(key) != value]
+        if different:
+            print(f"warning: the baseline was recorded on a different machine (different {', '.join(different)})",
+                  file=sys.stderr)
+        scale = 1.0
+        if meta.get("reference_seconds"):
+            scale = report["meta"]["reference_seconds"] / meta["reference_seconds"]
+            print(f"This machine ran the reference kernel {scale:.2f}x as long as the baseline's; "
+                  f"baseline timings are scaled by that.", file=sys.stderr)
+        else:
+            print("warning: the baseline has no reference timing, raw timings are compared", file=sys.stderr)
+        regressions = compare(report["results"], baseline["results"], args.tolerance, scale)
+        for name, ref, value in regressions:
+            print(f"REGRESSION {name}: baseline={ref} now={value}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
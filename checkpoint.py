@@ -0,0 +1,155 @@
+import json
+import os
+import random
+import tempfile
+
+import numpy as np
+
+from magic_square_chromosome import MagicSquareChromosome
+from most_perfect_magic_square_chromosome import MostPerfectMagicSquareChromosome
+
+CHECKPOINT_VERSION = 1
+
+# constructor arguments stored with every checkpoint, per manager class
+_COMMON_PARAMS = ("state", "mutation_rate", "elitism", "engine", "selection", "tournament_size",
+                  "crossover", "checkpoint_path", "checkpoint_every", "local_search", "local_search_budget",
+                  "deduplicate", "adaptive")
+_ISLAND_PARAMS = ("topology", "emigrant_policy", "migration_interval", "migration_rate")
+
+
+def _island_layout(manager):
+    """Returns the manager's islands as lists; a plain population is one island"""
+    if hasattr(manager, "islands"):
+        return manager.islands
+    return [manager.population]
+
+
+def _rng_arrays_and_meta():
+    """Captures the state of np.random and random"""
+    _, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+    version, internal, gauss_next = random.getstate()
+    arrays = {
+        "np_rng_keys": np.asarray(keys, dtype=np.uint32),
+        "py_rng_state": np.asarray(internal, dtype=np.uint32),
+    }
+    meta = {
+        "np_rng_pos": int(pos),
+        "np_rng_has_gauss": int(has_gauss),
+        "np_rng_cached_gaussian": float(cached_gaussian),
+        "py_rng_version": version,
+        "py_rng_gauss_next": gauss_next,
+    }
+    return arrays, meta
+
+
+def _restore_rngs(data, meta):
+    np.random.set_state(("MT19937", data["np_rng_keys"], meta["np_rng_pos"],
+                         meta["np_rng_has_gauss"], meta["np_rng_cached_gaussian"]))
+    random.setstate((meta["py_rng_version"], tuple(int(x) for x in data["py_rng_state"]),
+                     meta["py_rng_gauss_next"]))
+
+
+def save_checkpoint(manager, path, history=None):
+    """
+    Writes the full state of a populationManagement or
+    IslandPopulationManagement to path as an uncompressed .npz file.
+
+    The file holds the stacked boards of every island, the ages, the
+    island sizes, the generation, evaluation and migration counters, the
+    progress of the adaptive controller, the state of both RNGs and the
+    constructor arguments, so load_checkpoint() continues the run
+    bit-exactly. history optionally maps names to 1-D sequences (e.g. the
+    GUI's fitness curves) stored alongside. The file is written under a
+    temporary name and renamed into place, so a crash never leaves a
+    half-written checkpoint behind.
+    """
+    if getattr(manager, "_workers", None) is not None:
+        raise TypeError("Worker processes hold the islands of a parallel run and cannot be checkpointed; "
+                        "only populationManagement and IslandPopulationManagement support checkpoints.")
+    islands = _island_layout(manager)
+    population = [chrom for island in islands for chrom in island]
+
+    meta = {
+        "version": CHECKPOINT_VERSION,
+        "manager": "islands" if hasattr(manager, "islands") else "population",
+        "N": population[0].n,
+        "size": manager.size,
+        "most_state": isinstance(population[0], MostPerfectMagicSquareChromosome),
+        "generation": manager.generation,
+        "evaluations": manager.evaluations,
+        "params": {name: getattr(manager, name) for name in _COMMON_PARAMS},
+    }
+    if manager.adaptation is not None:
+        meta["adaptation"] = manager.adaptation.snapshot()
+    if meta["manager"] == "islands":
+        meta["params"].update({name: getattr(manager, name) for name in _ISLAND_PARAMS})
+        meta["migration_epoch"] = manager.migration_epoch
+    rng_arrays, rng_meta = _rng_arrays_and_meta()
+    meta.update(rng_meta)
+
+    arrays = {
+        "boards": np.stack([chrom.square for chrom in population]),
+        "ages": np.array([chrom.age for chrom in population], dtype=np.int64),
+        "island_sizes": np.array([len(island) for island in islands], dtype=np.int64),
+        "meta": np.array(json.dumps(meta)),
+        **rng_arrays,
+    }
+    for name, values in (history or {}).items():
+        arrays[f"history_{name}"] = np.asarray(values)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoint-", suffix=".npz")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_checkpoint(path, restore_rng=True):
+    """
+    Rebuilds the manager saved by save_checkpoint(). With restore_rng the
+    global np.random and random states are rewound as well, so evolving
+    the returned manager repeats the original run exactly.
+    """
+    # imported here, the managers themselves import this module
+    from population_management import populationManagement
+    from SeparatePopulationManagement import IslandPopulationManagement
+
+    with np.load(path) as data:
+        meta = json.loads(str(data["meta"]))
+        if meta["version"] != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {meta['version']} in {path}.")
+        n = meta["N"]
+        chromosome_cls = MostPerfectMagicSquareChromosome if meta["most_state"] else MagicSquareChromosome
+        population = [chromosome_cls(n, board) for board in data["boards"]]
+        for chrom, age in zip(population, data["ages"]):
+            chrom.age = int(age)
+        islands, start = [], 0
+        for island_size in data["island_sizes"]:
+            islands.append(population[start:start + island_size])
+            start += island_size
+
+        if meta["manager"] == "islands":
+            manager = IslandPopulationManagement(n, meta["size"], most_state=meta["most_state"],
+                                                 islands=islands, num_islands=len(islands), **meta["params"])
+            manager.migration_epoch = meta["migration_epoch"]
+        else:
+            manager = populationManagement(n, meta["size"], most_state=meta["most_state"],
+                                           population=islands[0], **meta["params"])
+        manager.generation = meta["generation"]
+        # absent from checkpoints written before the counter existed
+        manager.evaluations = meta.get("evaluations", manager.evaluations)
+        if manager.adaptation is not None and "adaptation" in meta:
+            manager.adaptation.restore(meta["adaptation"])
+        if restore_rng:
+            _restore_rngs(data, meta)
+    return manager
+
+
+def load_history(path):
+    """Returns the history arrays stored with a checkpoint as a dict"""
+    with np.load(path) as data:
+        return {name[len("history_"):]: data[name] for name in data.files if name.startswith("history_")}
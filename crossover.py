@@ -0,0 +1,150 @@
+import numpy as np
+
+
+def repair_permutations(children):
+    """
+    Makes every board of a (C, n, n) stack a permutation of 1..n^2 again.
+
+    Like MagicSquareChromosome.fix_missing_numbers, the first occurrence of
+    a value (in row-major order) is kept and every later duplicate is
+    replaced by the missing values in ascending order. All boards are
+    repaired together in one linear-time pass. Returns the repaired stack.
+    """
+    children = np.asarray(children)
+    shape = children.shape
+    flat = children.reshape(shape[0], -1).copy()
+    num_children, length = flat.shape
+    rows = np.arange(num_children)[:, None]
+
+    # position of the first occurrence of every value on every board
+    first = np.full((num_children, length + 1), length, dtype=np.intp)
+    positions = np.broadcast_to(np.arange(length), flat.shape)
+    np.minimum.at(first, (np.broadcast_to(rows, flat.shape), flat), positions)
+
+    duplicate = first[rows, flat] != positions
+    missing = first[:, 1:] == length
+
+    # both masks hold the same number of entries per board and np.nonzero
+    # walks them board by board, so duplicates and missing values pair up
+    # in row-major and ascending order respectively
+    dup_rows, dup_cols = np.nonzero(duplicate)
+    _, missing_values = np.nonzero(missing)
+    flat[dup_rows, dup_cols] = missing_values + 1
+    return flat.reshape(shape)
+
+
+def uniform_crossover(parents1, parents2):
+    """
+    Takes each cell from either parent with equal probability, using one
+    mask draw for the whole (C, n, n) stack, then repairs the children.
+    """
+    mask = np.random.random(parents1.shape) < 0.5
+    return repair_permutations(np.where(mask, parents1, parents2))
+
+
+def _flat_inverse(flat):
+    """Position of every value 1..L on each flattened board, indexed by value"""
+    num_children, length = flat.shape
+    inverse = np.empty((num_children, length + 1), dtype=np.intp)
+    inverse[np.arange(num_children)[:, None], flat] = np.arange(length)
+    return inverse
+
+
+def pmx_crossover(parents1, parents2):
+    """
+    Partially mapped crossover on the row-major flattening of each board.
+
+    Every child copies a random slice of the first parent and fills the
+    rest from the second, following the slice's value mapping until a
+    value is free. The conflicts of all children are resolved together.
+    """
+    shape = parents1.shape
+    p1 = parents1.reshape(shape[0], -1)
+    p2 = parents2.reshape(shape[0], -1)
+    num_children, length = p1.shape
+    rows = np.arange(num_children)[:, None]
+
+    cuts = np.sort(np.random.randint(0, length + 1, size=(num_children, 2)), axis=1)
+    positions = np.arange(length)
+    segment = (positions >= cuts[:, :1]) & (positions < cuts[:, 1:])
+
+    child = np.where(segment, p1, p2)
+    pos1 = _flat_inverse(p1)
+    # a value from parent 2 clashes when it already sits in the copied slice
+    clash = ~segment & segment[rows, pos1[rows, child]]
+    while clash.any():
+        clash_rows, clash_cols = np.nonzero(clash)
+        values = child[clash_rows, clash_cols]
+        child[clash_rows, clash_cols] = p2[clash_rows, pos1[clash_rows, values]]
+        clash[clash_rows, clash_cols] = segment[clash_rows, pos1[clash_rows, child[clash_rows, clash_cols]]]
+    return child.reshape(shape)
+
+
+def cycle_crossover(parents1, parents2):
+    """
+    Cycle crossover on the row-major flattening of each board.
+
+    Positions are split into the cycles of the permutation that maps each
+    position to where the second parent's value sits in the first parent;
+    alternating cycles are copied from the first and the second parent.
+    Cycles are labelled for all children at once by pointer doubling.
+    """
+    shape = parents1.shape
+    p1 = parents1.reshape(shape[0], -1)
+    p2 = parents2.reshape(shape[0], -1)
+    num_children, length = p1.shape
+    rows = np.arange(num_children)[:, None]
+
+    step = _flat_inverse(p1)[rows, p2]
+    label = np.broadcast_to(np.arange(length), p1.shape).copy()
+    # after k rounds every label is the minimum over 2^k steps of its cycle
+    for _ in range(max(1, int(np.ceil(np.log2(length))))):
+        label = np.minimum(label, label[rows, step])
+        step = step[rows, step]
+
+    # number the cycles in order of their smallest position
+    starts = label == np.arange(length)
+    rank = np.cumsum(starts, axis=1) - 1
+    cycle = rank[rows, label]
+    return np.where(cycle % 2 == 0, p1, p2).reshape(shape)
+
+
+CROSSOVERS = {
+    "uniform": uniform_crossover,
+    "pmx": pmx_crossover,
+    "cycle": cycle_crossover,
+}
+
+
+def check_crossover(method):
+    """
+    Raises ValueError for an unknown crossover name.
+    """
+    if method not in CROSSOVERS:
+        raise ValueError(f"Unknown crossover {method!r}, expected one of {sorted(CROSSOVERS)}.")
+
+
+def crossover_boards(parents1, parents2, method="uniform"):
+    """
+    Produces one child per parent pair from two (C, n, n) parent stacks.
+    """
+    if len(parents1) == 0:
+        return np.empty_like(parents1)
+    return CROSSOVERS[method](parents1, parents2)
+
+
+def cross_over_pairs(pairs, method="uniform"):
+    """
+    Crosses over a list of (parent1, parent2) chromosomes in one batch.
+
+    The parents are stacked into two (C, n, n) arrays and the children come
+    back as chromosomes of the parents' class, each a view into one shared
+    child array (so no throw-away random boards are generated).
+    """
+    if not pairs:
+        return []
+    parent = pairs[0][0]
+    first = np.stack([parent1.square for parent1, _ in pairs])
+    second = np.stack([parent2.square for _, parent2 in pairs])
+    chromosome_cls = type(parent)
+    return [chromosome_cls(parent.n, board) for board in crossover_boards(first, second, method)]
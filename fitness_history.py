@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class FitnessHistory:
+    """
+    Fixed-memory record of per-generation curves (by default best and
+    average fitness) for live plotting of arbitrarily long runs.
+
+    The most recent `recent` generations are kept exactly in a ring buffer.
+    The whole run is also folded into at most `buckets` min/max buckets:
+    when they fill up, neighbouring buckets are merged and every bucket
+    covers twice as many generations, so the overview keeps the extremes
+    (and therefore the shape) of the run at a resolution that halves as it
+    grows. Appending is amortised O(1) and curve() returns at most
+    2 * buckets + recent points however long the run is.
+    """
+
+    def __init__(self, names=("best", "avg"), recent=512, buckets=1024):
+        if buckets < 2 or buckets % 2:
+            raise ValueError("buckets must be an even number of at least 2.")
+        self.names = tuple(names)
+        self.generations = 0
+        self.max_value = None
+        num_series = len(self.names)
+        # ring buffer of the latest generations
+        self._recent = np.zeros((num_series, recent))
+        # min/max buckets, each covering self._stride generations
+        self._mins = np.zeros((num_series, buckets))
+        self._maxs = np.zeros((num_series, buckets))
+        self._used = 0
+        self._stride = 1
+        self._pending_min = np.full(num_series, np.inf)
+        self._pending_max = np.full(num_series, -np.inf)
+        self._pending = 0
+
+    def append(self, *values):
+        """Records one generation, one value per series in the order of names"""
+        values = np.asarray(values, dtype=float)
+        self._recent[:, self.generations % self._recent.shape[1]] = values
+        self.generations += 1
+        peak = values.max()
+        if self.max_value is None or peak > self.max_value:
+            self.max_value = peak
+
+        np.minimum(self._pending_min, values, out=self._pending_min)
+        np.maximum(self._pending_max, values, out=self._pending_max)
+        self._pending += 1
+        if self._pending == self._stride:
+            self._close_bucket()
+
+    def extend(self, *columns):
+        """Records several generations, one sequence per series"""
+        for values in zip(*columns):
+            self.append(*values)
+
+    def _close_bucket(self):
+        self._mins[:, self._used] = self._pending_min
+        self._maxs[:, self._used] = self._pending_max
+        self._used += 1
+        self._pending_min.fill(np.inf)
+        self._pending_max.fill(-np.inf)
+        self._pending = 0
+        if self._used == self._mins.shape[1]:
+            # halve the resolution, the pending bucket keeps filling up to the new stride
+            half = self._used // 2
+            self._mins[:, :half] = np.minimum(self._mins[:, 0::2], self._mins[:, 1::2])
+            self._maxs[:, :half] = np.maximum(self._maxs[:, 0::2], self._maxs[:, 1::2])
+            self._used = half
+            self._stride *= 2
+
+    def recent(self, name):
+        """Returns (generations, values) of the exactly kept latest generations of a series"""
+        series = self.names.index(name)
+        count = min(self.generations, self._recent.shape[1])
+        x = np.arange(self.generations - count, self.generations)
+        return x, self._recent[series, x % self._recent.shape[1]]
+
+    def curve(self, name):
+        """
+        Returns (generations, values) to plot for a series: the min/max
+        envelope of the buckets before the recent window, as two points per
+        bucket, followed by the recent generations themselves.
+        """
+        series = self.names.index(name)
+        recent_x, recent_y = self.recent(name)
+        start = recent_x[0] if len(recent_x) else 0
+        # buckets that end before the ring buffer starts
+        count = min(self._used, start // self._stride)
+        centres = (np.arange(count) + 0.5) * self._stride
+        x = np.concatenate([np.repeat(centres, 2), recent_x])
+        envelope = np.stack([self._mins[series, :count], self._maxs[series, :count]], axis=1).ravel()
+        return x, np.concatenate([envelope, recent_y])
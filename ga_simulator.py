@@ -1,3 +1,4 @@
+import queue
 import tkinter as tk
 from tkinter import ttk
 import numpy as np
@@ -5,6 +6,9 @@ from magic_square_chromosome import MagicSquareChromosome
 from most_perfect_magic_square_chromosome import MostPerfectMagicSquareChromosome
 from population_management import populationManagement
 from SeparatePopulationManagement import IslandPopulationManagement
+from population_view import PopulationGrid
+from simulation_worker import SimulationWorker
+from fitness_history import FitnessHistory
 from tkinter import messagebox
 import matplotlib
 matplotlib.use("TkAgg")          
@@ -13,7 +17,7 @@ import matplotlib.pyplot as plt
 
 
 class GASimulatorGUI(tk.Tk):
-    def __init__(self, N, size, state=0, most_state=False, max_gens=None):
+    def __init__(self, N, size, state=0, most_state=False, max_gens=None, fps=20, elitism=0.2, mutation_rate=0.2):
         super().__init__()
         self.title("GA Magic Square Simulator")
         self.geometry("1400x700")
@@ -26,8 +30,11 @@ class GASimulatorGUI(tk.Tk):
         self.state = state
         self.most_state = most_state
         self.max_generations = max_gens
-        self.best_history = [] 
-        self.avg_history  = []  
+        self.fps = fps
+        self.elitism = elitism
+        self.mutation_rate = mutation_rate
+        self.history = FitnessHistory(("best", "avg"))
+        self._plot_background = None
 
         # Population manager placeholder
         self.pop_mgr = None
@@ -80,16 +87,10 @@ class GASimulatorGUI(tk.Tk):
 
         VISIBLE_H = 450
         self.pop_canvas = tk.Canvas(top_frame, bg="white", height=VISIBLE_H)
-        vscroll = ttk.Scrollbar(top_frame, orient="vertical",
-                                command=self.pop_canvas.yview)
+        vscroll = ttk.Scrollbar(top_frame, orient="vertical", command=self._scroll_population)
         self.pop_canvas.configure(yscrollcommand=vscroll.set)
-
-        self.pop_frame = ttk.Frame(self.pop_canvas)
-        self.pop_canvas.create_window((0, 0), window=self.pop_frame, anchor="nw")
-        self.pop_frame.bind(
-            "<Configure>",
-            lambda e: self.pop_canvas.configure(scrollregion=self.pop_canvas.bbox("all"))
-        )
+        self.pop_grid = PopulationGrid(self.pop_canvas)
+        self.pop_canvas.bind("<Configure>", lambda e: self.pop_grid.render())
 
         self.pop_canvas.grid(row=0, column=0, sticky="nsew")
         vscroll.grid(row=0, column=1, sticky="ns")
@@ -97,21 +98,23 @@ class GASimulatorGUI(tk.Tk):
         top_frame.grid_columnconfigure(0, weight=1)
 
         def _on_mousewheel(event):
-            self.pop_canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
+            self._scroll_population("scroll", int(-1 * (event.delta / 120)), "units")
         self.pop_canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        self.pop_canvas.bind_all("<Button-4>", lambda e: self.pop_canvas.yview_scroll(-1, "units"))
-        self.pop_canvas.bind_all("<Button-5>", lambda e: self.pop_canvas.yview_scroll(1, "units"))
+        self.pop_canvas.bind_all("<Button-4>", lambda e: self._scroll_population("scroll", -1, "units"))
+        self.pop_canvas.bind_all("<Button-5>", lambda e: self._scroll_population("scroll", 1, "units"))
 
         # bottom area (live plot)
         self.fig, self.ax = plt.subplots(figsize=(8, 2), dpi=100)
-        self.best_line, = self.ax.plot([], [], label="Best")
-        self.avg_line,  = self.ax.plot([], [], label="Average")
+        # the curves are animated: left out of full redraws and blitted on top
+        self.best_line, = self.ax.plot([], [], label="Best", animated=True)
+        self.avg_line,  = self.ax.plot([], [], label="Average", animated=True)
         self.ax.set_xlabel("Generation")
         self.ax.set_ylabel("Fitness")
         self.ax.legend(loc="upper right")
         self.fig.tight_layout()
 
         self.canvas_plot = FigureCanvasTkAgg(self.fig, master=body)
+        self.canvas_plot.mpl_connect("draw_event", self._cache_plot_background)
         self.canvas_plot.draw()
 
         plot_widget = self.canvas_plot.get_tk_widget()
@@ -120,6 +123,32 @@ class GASimulatorGUI(tk.Tk):
         body.grid_rowconfigure(1,   weight=0)   
 
 
+    def _cache_plot_background(self, event):
+        # after every full redraw (first show, resize, new limits) keep the static axes for blitting
+        self._plot_background = self.canvas_plot.copy_from_bbox(self.fig.bbox)
+        self.ax.draw_artist(self.best_line)
+        self.ax.draw_artist(self.avg_line)
+
+    def _update_plot(self):
+        history = self.history
+        self.best_line.set_data(*history.curve("best"))
+        self.avg_line.set_data(*history.curve("avg"))
+        if history.generations > self.ax.get_xlim()[1] or history.max_value > self.ax.get_ylim()[1]:
+            # the limits grow geometrically, so full redraws get rarer as the run goes on
+            self.ax.set_xlim(0, max(100, 2 * history.generations))
+            self.ax.set_ylim(0, history.max_value * 1.05 if history.max_value > 0 else 1)
+            self.canvas_plot.draw()
+        elif self._plot_background is not None:
+            self.canvas_plot.restore_region(self._plot_background)
+            self.ax.draw_artist(self.best_line)
+            self.ax.draw_artist(self.avg_line)
+            self.canvas_plot.blit(self.fig.bbox)
+
+    def _scroll_population(self, *args):
+        # only the visible thumbnails exist, so every scroll redraws the viewport
+        self.pop_canvas.yview(*args)
+        self.pop_grid.render()
+
     def set_state(self, state):
         self.state = state
 
@@ -134,14 +163,20 @@ class GASimulatorGUI(tk.Tk):
                 size=self.size,
                 state=getattr(self, 'state', 0),
                 most_state=getattr(self, 'most_state', False),
-                elitism=0.2,
-                mutation_rate=0.2
+                elitism=self.elitism,
+                mutation_rate=self.mutation_rate,
+                engine="tensor"
             )
             self.sim_running = True
-            self._run_step()
+            self.sim_thread = SimulationWorker(self.pop_mgr, self.max_generations, min_interval=1 / self.fps)
+            self.sim_thread.start()
+            self._poll_snapshot()
 
     def stop_sim(self):
         self.sim_running = False   
+        if self.sim_thread is not None:
+            self.sim_thread.stop()
+            self.sim_thread.join()
         self.destroy()
         ConfigWindow().mainloop()
 
@@ -179,19 +214,15 @@ class GASimulatorGUI(tk.Tk):
         b = int(255 * (1 - ratio))
         return f'#{r:02x}{g:02x}{b:02x}'
     
-    def _display_winner(self, chrom):
+    def _display_winner(self, board, generation):
         # Clear the population display area
-        for w in self.pop_frame.winfo_children():
-            w.destroy()
+        self.pop_grid.clear()
+        self.pop_canvas.yview_moveto(0)
         
         # Update labels
-        self.gen_label.config(text=f"Perfect Square Found! Generation: {self.pop_mgr.get_generation()}")
+        self.gen_label.config(text=f"Perfect Square Found! Generation: {generation}")
         self.best_label.config(text=f"Fitness: 0")
 
-        # Create a new canvas for the winner display
-        winner_canvas = tk.Canvas(self.pop_frame, bg='white', width=400, height=400)
-        winner_canvas.pack(expand=True)
-
         # Center the large square on the winner canvas
         canvas_width = 400
         canvas_height = 400
@@ -199,79 +230,51 @@ class GASimulatorGUI(tk.Tk):
         x0 = (canvas_width - board_size) / 2
         y0 = (canvas_height - board_size) / 2
 
-        self._draw_board(winner_canvas, chrom.get_square(), x0, y0, board_size, fill_color='#66ccff', font_size=25)
+        self._draw_board(self.pop_canvas, board, x0, y0, board_size, fill_color='#66ccff', font_size=25)
         
         # Update scroll region
         self.pop_canvas.configure(scrollregion=self.pop_canvas.bbox("all"))
 
-    def _run_step(self):
+    def _poll_snapshot(self):
+        # the GA runs in self.sim_thread, the Tk loop only samples its latest snapshot
         if not self.sim_running:
             return
+        try:
+            snapshot = self.sim_thread.snapshots.get_nowait()
+        except queue.Empty:
+            self.after(int(1000 / self.fps), self._poll_snapshot)
+            return
+        self._render_snapshot(snapshot)
+        if not snapshot["done"]:
+            self.after(int(1000 / self.fps), self._poll_snapshot)
 
-        self.pop_mgr.evaluate_population()
-        pop = sorted(
-            self.pop_mgr.get_population(),
-            key=lambda c: c.get_fitness()
-        )
-        gen = self.pop_mgr.get_generation()
-        best = pop[0]  
-        fitness_values = [c.get_fitness() for c in pop]
-        self.best_history.append(pop[0].get_fitness())
-        self.avg_history.append(sum(fitness_values) / len(fitness_values))
-
-        x = range(len(self.best_history))
-        self.best_line.set_data(x, self.best_history)
-        self.avg_line.set_data(x, self.avg_history)
-
-        self.ax.set_xlim(0, max(1, len(self.best_history)))
-        y_max = max(self.best_history + self.avg_history)
-        self.ax.set_ylim(0, y_max * 1.05 if y_max > 0 else 1)
-        self.canvas_plot.draw_idle()
+    def _render_snapshot(self, snapshot):
+        gen = snapshot["generation"]
+        fitness_values = snapshot["fitnesses"]
+        best_fitness = fitness_values[0]
+        self.history.extend(snapshot["best_history"], snapshot["avg_history"])
+        self._update_plot()
 
         self.gen_label.config(text=f"Generation: {gen}")
-        self.best_label.config(text=f"Best Fitness: {best.get_fitness():.4f}")
+        self.best_label.config(text=f"Best Fitness: {best_fitness:.4f}")
 
-        if best.get_fitness() == 0:
+        if snapshot["solved"]:
             self.sim_running = False
-            self._display_winner(best)
+            self._display_winner(snapshot["boards"][0], gen)
             return
         
-        if self.max_generations is not None and gen >= self.max_generations:
+        if snapshot["done"]:
             self.sim_running = False
             messagebox.showinfo("Simulation finished",
                                 f"Stopped after {self.max_generations} generations.\n"
-                                f"Best fitness reached: {pop[0].get_fitness():.4f}")
+                                f"Best fitness reached: {best_fitness:.4f}")
             return
 
-        for w in self.pop_frame.winfo_children():
-            w.destroy()
-
-        board_size = 60
-        pad = 10
-        min_fit, max_fit = min(fitness_values), max(fitness_values)
-        self.pop_canvas.update_idletasks()           
-        canvas_w = self.pop_canvas.winfo_width()
-        cols = max(1, (canvas_w - pad) // (board_size + pad)) - 2
-            
-        for idx, chrom in enumerate(pop):
-            row, col = divmod(idx, cols)
-
-            c = tk.Canvas(self.pop_frame,
-                        width=board_size, height=board_size,
-                        highlightthickness=0, bg='white')
-
-            # use grid instead of place
-            c.grid(row=row, column=col, padx=pad, pady=pad)
-
-            self._draw_board(c, chrom.get_square(), 0, 0, board_size,
-                            fill_color=self.fitness_to_color(chrom.get_fitness(),
-                                                            min_fit, max_fit))
-
-        # Update scroll region and continue simulation
-        self.pop_canvas.configure(scrollregion=self.pop_canvas.bbox("all"))
-
-        # Schedule next step
-        self.after(300, self._run_step)
+        min_fit, max_fit = fitness_values.min(), fitness_values.max()
+        self.pop_grid.set_population(
+            snapshot["boards"],
+            [self.fitness_to_color(fitness, min_fit, max_fit) for fitness in fitness_values]
+        )
 
 class ConfigWindow(tk.Tk):
     def __init__(self):
@@ -283,12 +286,16 @@ class ConfigWindow(tk.Tk):
         tk.Label(self, text="Evolution Strategy:").grid(row=2, column=0, padx=10, pady=5, sticky="e")
         tk.Label(self, text="Population Size:").grid(row=3, column=0, padx=10, pady=5, sticky="e")
         tk.Label(self, text="Max Generations:").grid(row=4, column=0, padx=10, pady=5, sticky="e")
+        tk.Label(self, text="Elitism:").grid(row=5, column=0, padx=10, pady=5, sticky="e")
+        tk.Label(self, text="Mutation Rate:").grid(row=6, column=0, padx=10, pady=5, sticky="e")
 
         self.n_var = tk.IntVar(value=3)
         self.type_var = tk.StringVar(value="Regular")
         self.strategy_var = tk.StringVar(value="Regular")
         self.pop_var       = tk.IntVar(value=100)     
         self.gen_var       = tk.IntVar(value=500)     
+        self.elitism_var   = tk.DoubleVar(value=0.2)
+        self.mutation_var  = tk.DoubleVar(value=0.2)
         
 
         n_entry = ttk.Combobox(self, textvariable=self.n_var, values=[3, 4, 5, 8], state="readonly")
@@ -302,9 +309,11 @@ class ConfigWindow(tk.Tk):
 
         ttk.Entry(self, textvariable=self.pop_var, width=10).grid(row=3, column=1, pady=5)   
         ttk.Entry(self, textvariable=self.gen_var, width=10).grid(row=4, column=1, pady=5)  
+        ttk.Entry(self, textvariable=self.elitism_var, width=10).grid(row=5, column=1, pady=5)
+        ttk.Entry(self, textvariable=self.mutation_var, width=10).grid(row=6, column=1, pady=5)
 
         start_button = ttk.Button(self, text="Start Simulation", command=self.start_simulation)
-        start_button.grid(row=5, columnspan=2, pady=10)
+        start_button.grid(row=7, columnspan=2, pady=10)
         
 
     def start_simulation(self):
@@ -313,6 +322,8 @@ class ConfigWindow(tk.Tk):
         strategy = self.strategy_var.get()
         pop_size  = self.pop_var.get()     
         max_gens  = self.gen_var.get() 
+        elitism   = self.elitism_var.get()
+        mutation_rate = self.mutation_var.get()
         state = {"Regular": 0, "Darwinian": 1, "Lamarckian": 2}[strategy]
 
         if most and N not in [4, 8]:
@@ -321,12 +332,16 @@ class ConfigWindow(tk.Tk):
         if pop_size <= 0 or max_gens <= 0:
             messagebox.showerror("Invalid Configuration", "Population size and max generations must be positive integers.")
             return
+        if not (0 <= elitism < 1 and 0 <= mutation_rate <= 1):
+            messagebox.showerror("Invalid Configuration", "Elitism must be in [0, 1) and mutation rate in [0, 1].")
+            return
 
         # Close config window
         self.destroy()
 
         # Launch simulation GUI
-        app = GASimulatorGUI(N=N, size=pop_size, state=state, most_state=most, max_gens=max_gens)
+        app = GASimulatorGUI(N=N, size=pop_size, state=state, most_state=most, max_gens=max_gens,
+                             elitism=elitism, mutation_rate=mutation_rate)
         app.set_state(state)
         app.set_most_state(most)
         app.start_sim()
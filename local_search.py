@@ -0,0 +1,349 @@
+import numpy as np
+
+from population_tensor import population_fitness
+from profiling import PROFILER
+
+# "greedy" is local_optimize (one random heavy/light swap per attempt); the
+# others search the full swap neighbourhood scored by delta_matrix()
+LOCAL_SEARCHES = ("greedy", "steepest", "tabu", "anneal")
+
+# default evaluation budget, in full sweeps of the swap neighbourhood
+DEFAULT_SWEEPS = 4
+
+# rough number of int64 temporaries delta_matrix may allocate per call
+_CHUNK_ELEMENTS = 1 << 22
+
+_neighbourhoods = {}
+
+
+def check_local_search(method):
+    """
+    Raises ValueError for an unknown local search name.
+    """
+    if method not in LOCAL_SEARCHES:
+        raise ValueError(f"Unknown local search {method!r}, expected one of {list(LOCAL_SEARCHES)}.")
+
+
+class SwapNeighbourhood:
+    """
+    Constraint structure of one chromosome class and board size, shared by
+    every board: the constraint matrix, the constraints each cell belongs
+    to (padded to the same length) and every constraint shared by two
+    distinct cells.
+    """
+
+    def __init__(self, chromosome_cls, n):
+        A, self.targets = chromosome_cls.constraint_matrix(n)
+        self.n = n
+        self.cells = n * n
+        self.A = A.astype(np.int64)
+        self.cell_rows = self.A.T.copy()
+
+        counts = A.sum(axis=0)
+        width = counts.max()
+        self.members = np.zeros((self.cells, width), dtype=np.intp)
+        self.member_mask = np.zeros((self.cells, width), dtype=np.int64)
+        for cell in range(self.cells):
+            ks = np.nonzero(A[:, cell])[0]
+            self.members[cell, :len(ks)] = ks
+            self.member_mask[cell, :len(ks)] = 1
+
+        # (a, b, k) for every ordered pair of distinct cells in constraint k,
+        # grouped by pair so each pair's terms can be summed with reduceat
+        shared = [(a, b, k) for k in range(len(A)) for a in np.nonzero(A[k])[0]
+                  for b in np.nonzero(A[k])[0] if a != b]
+        shared.sort()
+        self.shared_a, self.shared_b, self.shared_k = (np.array(column, dtype=np.intp) for column in zip(*shared))
+        pair_ids = self.shared_a * self.cells + self.shared_b
+        self.pair_starts = np.concatenate([[0], np.nonzero(np.diff(pair_ids))[0] + 1])
+        self.pair_a = self.shared_a[self.pair_starts]
+        self.pair_b = self.shared_b[self.pair_starts]
+
+    def residuals(self, flat):
+        """Constraint sums minus targets for a (B, n*n) stack of flat boards"""
+        return flat @ self.cell_rows - self.targets
+
+    def swap_evaluations(self):
+        """Number of distinct swaps in one sweep of the neighbourhood"""
+        return self.cells * (self.cells - 1) // 2
+
+
+def neighbourhood(chromosome_cls, n):
+    """Returns the cached SwapNeighbourhood of a chromosome class and size"""
+    key = (chromosome_cls, n)
+    if key not in _neighbourhoods:
+        _neighbourhoods[key] = SwapNeighbourhood(chromosome_cls, n)
+    return _neighbourhoods[key]
+
+
+def delta_matrix(flat, residuals, hood):
+    """
+    Returns the (B, L, L) fitness change of swapping cells a and b of every
+    board in a (B, L) stack of flat boards with the given residuals.
+
+    A swap moves d = x[b] - x[a] into a and out of b, so it is scored as
+    the change of every constraint holding a plus every constraint holding
+    b, minus the double count of the constraints holding both (whose sums
+    do not change at all).
+    """
+    d = flat[:, None, :] - flat[:, :, None]
+    r = residuals[:, hood.members]
+    gain = ((np.abs(r[:, :, None, :] + d[..., None]) - np.abs(r)[:, :, None, :])
+            * hood.member_mask[None, :, None, :]).sum(axis=-1)
+    delta = gain + gain.transpose(0, 2, 1)
+
+    r = residuals[:, hood.shared_k]
+    moved = d[:, hood.shared_a, hood.shared_b]
+    both = np.abs(r + moved) + np.abs(r - moved) - 2 * np.abs(r)
+    delta[:, hood.pair_a, hood.pair_b] -= np.add.reduceat(both, hood.pair_starts, axis=1)
+    return delta
+
+
+def _swap_cells(flat, residuals, rows, a, b, hood):
+    """Applies the swaps (a, b) to the listed boards, updating their residuals"""
+    d = flat[rows, b] - flat[rows, a]
+    flat[rows, a] += d
+    flat[rows, b] -= d
+    residuals[rows] += d[:, None] * (hood.cell_rows[a] - hood.cell_rows[b])
+
+
+def _chunks(count, hood):
+    per_board = hood.cells * hood.cells * hood.members.shape[1]
+    size = max(1, _CHUNK_ELEMENTS // per_board)
+    return [np.arange(start, min(count, start + size)) for start in range(0, count, size)]
+
+
+def steepest_descent(flat, residuals, hood, budget):
+    """
+    Repeatedly applies the best swap of the whole neighbourhood while it
+    improves the fitness and the budget allows another sweep.
+    """
+    active = np.arange(len(flat))
+    for _ in range(max(1, budget // hood.swap_evaluations())):
+        if len(active) == 0:
+            break
+        delta = delta_matrix(flat[active], residuals[active], hood).reshape(len(active), -1)
+        best = delta.argmin(axis=1)
+        improving = delta[np.arange(len(active)), best] < 0
+        if PROFILER.enabled:
+            PROFILER.count("swaps_attempted", len(active) * hood.swap_evaluations())
+            PROFILER.count("swaps_accepted", int(improving.sum()))
+        active, best = active[improving], best[improving]
+        _swap_cells(flat, residuals, active, best // hood.cells, best % hood.cells, hood)
+    return flat, residuals
+
+
+def tabu_search(flat, residuals, hood, budget, tenure=None):
+    """
+    Applies the best swap that touches no tabu cell every sweep, even when
+    it makes the board worse. Swapped cells stay tabu for ``tenure``
+    sweeps unless the swap would beat the best board seen so far.
+    Returns the best boards found.
+    """
+    rows = np.arange(len(flat))
+    tenure = max(2, hood.cells // 8) if tenure is None else tenure
+    fitness = np.abs(residuals).sum(axis=1)
+    best_flat, best_residuals, best_fitness = flat.copy(), residuals.copy(), fitness.copy()
+    tabu_until = np.zeros(flat.shape, dtype=np.int64)
+    for sweep in range(max(1, budget // hood.swap_evaluations())):
+        searching = best_fitness > 0
+        if not searching.any():
+            break
+        delta = delta_matrix(flat, residuals, hood)
+        tabu = (tabu_until > sweep)
+        forbidden = tabu[:, :, None] | tabu[:, None, :]
+        forbidden &= (fitness[:, None, None] + delta) >= best_fitness[:, None, None]
+        forbidden |= np.eye(hood.cells, dtype=bool)
+        delta[forbidden] = np.iinfo(np.int64).max
+        delta = delta.reshape(len(flat), -1)
+        move = delta.argmin(axis=1)
+        a, b = move // hood.cells, move % hood.cells
+        # a board whose every swap is tabu waits for the tenure to run out
+        moving = rows[searching & (delta[rows, move] != np.iinfo(np.int64).max)]
+        fitness[moving] += delta[moving, move[moving]]
+        _swap_cells(flat, residuals, moving, a[moving], b[moving], hood)
+        tabu_until[moving, a[moving]] = tabu_until[moving, b[moving]] = sweep + 1 + tenure
+        if PROFILER.enabled:
+            PROFILER.count("swaps_attempted", len(moving) * hood.swap_evaluations())
+            PROFILER.count("swaps_accepted", len(moving))
+        better = fitness < best_fitness
+        best_flat[better], best_residuals[better], best_fitness[better] = flat[better], residuals[better], fitness[better]
+    return best_flat, best_residuals
+
+
+def simulated_annealing(flat, residuals, hood, budget, start_temperature=None, end_temperature=0.05):
+    """
+    Proposes one random swap per board and step, accepting it when it does
+    not hurt or with probability exp(-delta / T). T cools geometrically
+    from start_temperature (default n^2 / 4) to end_temperature over the
+    budget. Returns the best boards found.
+    """
+    rows = np.arange(len(flat))
+    cells = hood.cells
+    temperature = cells / 4 if start_temperature is None else start_temperature
+    cooling = (end_temperature / temperature) ** (1 / max(1, budget))
+    fitness = np.abs(residuals).sum(axis=1)
+    best_flat, best_residuals, best_fitness = flat.copy(), residuals.copy(), fitness.copy()
+    for _ in range(budget):
+        a = np.random.randint(0, cells, size=len(flat))
+        b = (a + np.random.randint(1, cells, size=len(flat))) % cells
+        d = flat[rows, b] - flat[rows, a]
+        change = hood.cell_rows[a] - hood.cell_rows[b]
+        delta = (np.abs(residuals + d[:, None] * change) - np.abs(residuals)).sum(axis=1)
+        accept = (delta <= 0) | (np.random.random(len(flat)) < np.exp(-np.maximum(delta, 0) / temperature))
+        moving = rows[accept]
+        _swap_cells(flat, residuals, moving, a[moving], b[moving], hood)
+        fitness[moving] += delta[moving]
+        better = fitness < best_fitness
+        best_flat[better], best_residuals[better], best_fitness[better] = flat[better], residuals[better], fitness[better]
+        temperature *= cooling
+    if PROFILER.enabled:
+        PROFILER.count("swaps_attempted", len(flat) * budget)
+    return best_flat, best_residuals
+
+
+BOARD_SEARCHES = {
+    "steepest": steepest_descent,
+    "tabu": tabu_search,
+    "anneal": simulated_annealing,
+}
+
+
+def search_boards(boards, chromosome_cls, method="steepest", budget=None):
+    """
+    Runs a full-neighbourhood local search on every board of a (P, n, n)
+    stack and returns (learned boards, learned fitness).
+
+    budget is the number of swap evaluations allowed per board (default
+    DEFAULT_SWEEPS sweeps of the neighbourhood); steepest descent and
+    tabu search spend one sweep per move, annealing one evaluation.
+    The input boards are not modified.
+    """
+    num_boards, n, _ = boards.shape
+    hood = neighbourhood(chromosome_cls, n)
+    if budget is None:
+        budget = DEFAULT_SWEEPS * hood.swap_evaluations()
+    flat = boards.reshape(num_boards, -1).astype(np.int64)
+    residuals = hood.residuals(flat)
+    search = BOARD_SEARCHES[method]
+    for chunk in ([np.arange(num_boards)] if method == "anneal" else _chunks(num_boards, hood)):
+        flat[chunk], residuals[chunk] = search(flat[chunk], residuals[chunk], hood, budget)
+    return flat.astype(boards.dtype).reshape(boards.shape), np.abs(residuals).sum(axis=1)
+
+
+def _try_swaps(boards, fitness, who, cell1, cell2, chromosome_cls):
+    """
+    Swaps cell1 and cell2 on the boards listed in who, keeping a swap only
+    where it lowers the fitness. Returns the mask of accepted swaps.
+    """
+    rows = np.arange(len(who))
+    candidates = boards[who]
+    first = candidates[rows, cell1[0], cell1[1]]
+    candidates[rows, cell1[0], cell1[1]] = candidates[rows, cell2[0], cell2[1]]
+    candidates[rows, cell2[0], cell2[1]] = first
+    new_fitness = chromosome_cls.batch_fitness(candidates)
+    better = new_fitness < fitness[who]
+    boards[who[better]] = candidates[better]
+    fitness[who[better]] = new_fitness[better]
+    if PROFILER.enabled:
+        PROFILER.count("swaps_attempted", len(who))
+        PROFILER.count("swaps_accepted", int(better.sum()))
+    return better
+
+
+def batch_local_optimize(boards, chromosome_cls, fitness=None):
+    """
+    Runs MagicSquareChromosome.local_optimize on every board of a (P, n, n)
+    stack at once and returns (learned boards, learned fitness).
+
+    In each of up to n attempts every board that has not improved yet
+    tries one random swap between its heaviest and lightest row and, if
+    that is not possible or does not help, between its heaviest and
+    lightest column. The candidate swaps of all boards are scored with one
+    chromosome_cls.batch_fitness call, and a board stops at its first
+    improving swap, exactly like the per-chromosome version.
+    The input boards are not modified.
+    """
+    boards = np.array(boards)
+    num_boards, n, _ = boards.shape
+    m = n * (n**2 + 1) // 2
+    if fitness is None:
+        fitness = chromosome_cls.batch_fitness(boards)
+    fitness = np.array(fitness, dtype=np.int64)
+
+    active = np.arange(num_boards)
+    for _ in range(n):
+        if len(active) == 0:
+            break
+        current = boards[active]
+        row_sums = current.sum(axis=2, dtype=np.int64)
+        col_sums = current.sum(axis=1, dtype=np.int64)
+        rows = np.arange(len(active))
+        improved = np.zeros(len(active), dtype=bool)
+
+        # -- row swap: (heavy row, j) <-> (light row, k) ----------------
+        heavy, light = row_sums.argmax(axis=1), row_sums.argmin(axis=1)
+        trying = np.nonzero((row_sums[rows, heavy] > m) & (row_sums[rows, light] < m))[0]
+        if len(trying):
+            j, k = np.random.randint(0, n, size=(2, len(trying)))
+            improved[trying] = _try_swaps(boards, fitness, active[trying],
+                                          (heavy[trying], j), (light[trying], k), chromosome_cls)
+
+        # -- column swap: (i, heavy col) <-> (k, light col) -------------
+        heavy, light = col_sums.argmax(axis=1), col_sums.argmin(axis=1)
+        trying = np.nonzero(~improved & (col_sums[rows, heavy] > m) & (col_sums[rows, light] < m))[0]
+        if len(trying):
+            i, k = np.random.randint(0, n, size=(2, len(trying)))
+            improved[trying] = _try_swaps(boards, fitness, active[trying],
+                                          (i, heavy[trying]), (k, light[trying]), chromosome_cls)
+
+        # greedy first-improvement
+        active = active[~improved]
+    return boards, fitness
+
+
+def optimize_population(population, boards=None, write_back=True, method="greedy", budget=None):
+    """
+    Runs local search over a population and returns the learned fitness of
+    every chromosome.
+
+    With write_back (Lamarckian) the learned boards replace the
+    chromosomes' boards; without it (Darwinian) the population is left as
+    it is. Greedy search of a packed population (boards given) runs as one
+    batch, otherwise chromosome by chromosome. The other methods always
+    work on a stack of boards, see search_boards().
+    """
+    if method != "greedy":
+        with PROFILER.phase("local_optimize"):
+            source = boards if boards is not None else np.stack([chrom.square for chrom in population])
+            learned, fitness = search_boards(source, type(population[0]), method, budget)
+            if write_back:
+                for i, chrom in enumerate(population):
+                    if boards is not None:
+                        # the chromosomes are views into boards
+                        boards[i] = learned[i]
+                        chrom.invalidate_fitness()
+                    else:
+                        chrom.square = learned[i]
+                    chrom.set_cached_fitness(fitness[i])
+        return fitness
+
+    if boards is None:
+        if not write_back:
+            # copy-on-write clones only copy the boards that change
+            with PROFILER.phase("clone"):
+                population = [chrom.clone() for chrom in population]
+        with PROFILER.phase("local_optimize"):
+            for chrom in population:
+                chrom.local_optimize()
+        return population_fitness(population)
+
+    with PROFILER.phase("local_optimize"):
+        learned, fitness = batch_local_optimize(boards, type(population[0]), population_fitness(population, boards))
+        if write_back:
+            # the chromosomes are views into boards
+            boards[...] = learned
+            for chrom, learned_fitness in zip(population, fitness):
+                chrom.invalidate_fitness()
+                chrom.set_cached_fitness(learned_fitness)
+    return fitness
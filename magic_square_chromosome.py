@@ -1,22 +1,84 @@
-import copy
 import numpy as np
-from random import sample
-from math import sqrt
+from crossover import repair_permutations, uniform_crossover
+from profiling import PROFILER
+
+
+def board_dtype(n):
+    """
+    Returns the smallest unsigned dtype that holds the values 1..n^2.
+    """
+    if n * n <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if n * n <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+def random_boards(count, n):
+    """
+    Returns a (count, n, n) stack of random permutations of 1..n^2, all
+    drawn at once.
+    """
+    order = np.random.random((count, n * n)).argsort(axis=1)
+    return (order + 1).astype(board_dtype(n)).reshape(count, n, n)
+
+
 class MagicSquareChromosome:
-    def __init__(self, n):
+    # no per-instance __dict__; populations hold many thousands of these
+    __slots__ = ("n", "_square", "_fitness", "_sums", "_shared", "age", "m")
+
+    def __init__(self, n, square=None):
+        if PROFILER.enabled:
+            PROFILER.count("chromosomes_allocated")
         self.n = n
-        self.square = self.get_random_chromosome()
+        # A given square is used as-is (no copy), so a chromosome can be a
+        # thin view into a stacked (P, n, n) population array.
+        self.square = self.get_random_chromosome() if square is None else square
         self.age = 0
         self.m = n * (n**2 + 1) // 2
 
+    @property
+    def square(self):
+        return self._square
+
+    @square.setter
+    def square(self, value):
+        # Assigning a new board drops the cached fitness and line sums.
+        # In-place edits of the array from outside the class must call
+        # invalidate_fitness() and are only safe on a board that is not
+        # shared with a clone.
+        self._square = value
+        self._fitness = None
+        self._sums = None
+        self._shared = False
+
+    def rebind_square(self, square):
+        """
+        Points the chromosome at an identical copy of its board (e.g. its
+        slice of a packed population) while keeping the cached state.
+        The new board belongs to this chromosome alone.
+        """
+        self._square = square
+        if self._shared and self._sums is not None:
+            self._sums = tuple(np.copy(sums) for sums in self._sums)
+        self._shared = False
+
+    def _make_writable(self):
+        """
+        Gives the chromosome its own board and line sums if it still shares
+        them with a clone (copy-on-write).
+        """
+        if self._shared:
+            self._square = np.copy(self._square)
+            if self._sums is not None:
+                self._sums = tuple(np.copy(sums) for sums in self._sums)
+            self._shared = False
+
     def get_random_chromosome(self):
         """
         Generates a random chromosome for the magic square.
         """
-        numbers = list(range(1, self.n**2 + 1))
-        random_numbers = sample(numbers, len(numbers))
-        square = np.array(random_numbers).reshape(self.n, self.n)
-        return square
+        return random_boards(1, self.n)[0]
 
     def get_flat(self):
         """
@@ -46,29 +108,154 @@ class MagicSquareChromosome:
         Returns the size of the square.
         """
         return self.n
-    def get_fitness(self, fitness = 0):
+    def get_fitness(self):
         """
         Returns the fitness of the chromosome.
+
+        The value is cached until the board changes.
         """
-        # Check rows
-        for row in self.square:
-            fitness += np.abs(sum(row) - self.m)
-        # Check columns
-        for col in range(self.n):
-            fitness += np.abs(sum(self.square[:, col]) - self.m)
-        # Check diagonals
-        fitness += np.abs(sum(self.square[i][i] for i in range(self.n)) - self.m)
-        fitness += np.abs(sum(self.square[i][self.n - 1 - i] for i in range(self.n)) - self.m)
+        if self._fitness is None:
+            if PROFILER.enabled:
+                PROFILER.count("fitness_evaluations")
+            self._fitness = self._compute_fitness()
+        return self._fitness
+
+    def get_cached_fitness(self):
+        """
+        Returns the cached fitness, or None if it has to be recomputed.
+        """
+        return self._fitness
+
+    def set_cached_fitness(self, fitness):
+        """
+        Stores a fitness computed elsewhere (e.g. by batch_fitness).
+        """
+        self._fitness = fitness
+
+    def invalidate_fitness(self):
+        """
+        Drops the cached fitness and line sums after the board was changed
+        in place.
+        """
+        self._fitness = None
+        self._sums = None
+
+    def get_line_sums(self):
+        """
+        Returns the running (row_sums, col_sums, diag_sums) of the board,
+        where diag_sums holds the main and the anti diagonal.
+
+        The sums are computed once and then kept up to date by swap().
+        """
+        if self._sums is None:
+            square = self.square
+            self._sums = (
+                square.sum(axis=1, dtype=np.int64),
+                square.sum(axis=0, dtype=np.int64),
+                np.array([np.trace(square, dtype=np.int64), np.trace(square[:, ::-1], dtype=np.int64)]),
+            )
+        return self._sums
+
+    def _compute_fitness(self):
+        """
+        Computes the fitness of the chromosome from its line sums.
+        """
+        row_sums, col_sums, diag_sums = self.get_line_sums()
+        return (np.abs(row_sums - self.m).sum()
+                + np.abs(col_sums - self.m).sum()
+                + np.abs(diag_sums - self.m).sum())
+
+    def swap_delta(self, i, j, k, l):
+        """
+        Returns the change in fitness that swapping cells (i, j) and (k, l)
+        would cause, in constant time from the running line sums.
+        """
+        d = int(self.square[k, l]) - int(self.square[i, j])
+        if d == 0:
+            return 0
+        row_sums, col_sums, diag_sums = self.get_line_sums()
+        m = self.m
+        delta = 0
+        # (i, j) gains d and (k, l) loses d; a line holding both is unchanged
+        if i != k:
+            delta += (abs(row_sums[i] + d - m) - abs(row_sums[i] - m)
+                      + abs(row_sums[k] - d - m) - abs(row_sums[k] - m))
+        if j != l:
+            delta += (abs(col_sums[j] + d - m) - abs(col_sums[j] - m)
+                      + abs(col_sums[l] - d - m) - abs(col_sums[l] - m))
+        main = d * (int(i == j) - int(k == l))
+        if main:
+            delta += abs(diag_sums[0] + main - m) - abs(diag_sums[0] - m)
+        anti = d * (int(i + j == self.n - 1) - int(k + l == self.n - 1))
+        if anti:
+            delta += abs(diag_sums[1] + anti - m) - abs(diag_sums[1] - m)
+        return int(delta)
+
+    def swap(self, i, j, k, l):
+        """
+        Swaps cells (i, j) and (k, l), updating the line sums and a cached
+        fitness incrementally instead of rescanning the board.
+        """
+        self._make_writable()
+        if self._fitness is not None:
+            self._fitness += self.swap_delta(i, j, k, l)
+        if self._sums is not None:
+            d = int(self.square[k, l]) - int(self.square[i, j])
+            row_sums, col_sums, diag_sums = self._sums
+            row_sums[i] += d
+            row_sums[k] -= d
+            col_sums[j] += d
+            col_sums[l] -= d
+            diag_sums[0] += d * (int(i == j) - int(k == l))
+            diag_sums[1] += d * (int(i + j == self.n - 1) - int(k + l == self.n - 1))
+        self.square[i, j], self.square[k, l] = self.square[k, l], self.square[i, j]
+
+    @classmethod
+    def batch_fitness(cls, boards):
+        """
+        Returns the fitness of every board in a (P, n, n) stack at once.
+
+        Uses one set of axis sums plus the two diagonal traces instead of
+        walking each board in Python; the result matches get_fitness().
+        """
+        n = boards.shape[-1]
+        m = n * (n**2 + 1) // 2
+        # signed sums, the boards themselves are small unsigned integers
+        fitness = np.abs(boards.sum(axis=2, dtype=np.int64) - m).sum(axis=1)
+        fitness += np.abs(boards.sum(axis=1, dtype=np.int64) - m).sum(axis=1)
+        fitness += np.abs(np.trace(boards, axis1=1, axis2=2, dtype=np.int64) - m)
+        fitness += np.abs(np.trace(boards[:, :, ::-1], axis1=1, axis2=2, dtype=np.int64) - m)
         return fitness
+
+    @classmethod
+    def constraint_matrix(cls, n):
+        """
+        Describes the fitness as sum_k |A[k] . board.ravel() - targets[k]|
+        and returns (A, targets), where A is a (K, n*n) 0/1 matrix with one
+        row per constraint: every row, column and both diagonals.
+        """
+        cells = np.arange(n * n).reshape(n, n)
+        lines = list(cells) + list(cells.T) + [np.diagonal(cells), np.diagonal(cells[:, ::-1])]
+        A = np.zeros((len(lines), n * n), dtype=np.int8)
+        for k, line in enumerate(lines):
+            A[k, line] = 1
+        return A, np.full(len(lines), n * (n**2 + 1) // 2, dtype=np.int64)
     
     def clone(self):
         """
         Clones the current chromosome.
+
+        The clone shares the board and line sums with the original until
+        either of them is changed through swap() or fix_missing_numbers(),
+        which copies them first (copy-on-write), so cloning is O(1) and a
+        clone that is never changed never copies its board.
         """
-        clone = MagicSquareChromosome(self.n)
-        clone.square = np.copy(self.square)
+        clone = type(self)(self.n, self.square)
+        clone._fitness = self._fitness
+        clone._sums = self._sums
+        clone._shared = self._shared = True
         return clone
-    def mutate(self):
+    def mutate(self, swaps=None):
         """
         Perform k random pair-swaps where  
 
@@ -76,12 +263,12 @@ class MagicSquareChromosome:
 
         so for n = 3 you still mutate once, for n = 10 you mutate 5 times,
         etc.  You keep the nice “swap two cells” semantics, just more of
-        them when the board is larger.
+        them when the board is larger. swaps overrides k (see adaptive.py).
         """
-        k = max(1, self.n // 2)
+        k = max(1, self.n // 2) if swaps is None else swaps
         for _ in range(k):
             (i, j), (k_, l) = np.random.randint(0, self.n, size=(2, 2))
-            self.square[i, j], self.square[k_, l] = self.square[k_, l], self.square[i, j]
+            self.swap(i, j, k_, l)
 
 
     def cross_over(self, other):
@@ -95,32 +282,24 @@ class MagicSquareChromosome:
             other: Another MagicSquareChromosome to cross over with
             
         Returns:
-            A new MagicSquareChromosome resulting from the crossover
-        """
-        child = MagicSquareChromosome(self.n)
-        for i in range(self.n):
-            for j in range(self.n):
-                if np.random.rand() < 0.5:
-                    child.square[i][j] = self.square[i][j]
-                else:
-                    child.square[i][j] = other.square[i][j]
-
-        child.fix_missing_numbers()
-        return child
+            A new chromosome of the same class resulting from the crossover
+        """
+        child_square = uniform_crossover(self.square[None], other.square[None])[0]
+        return type(self)(self.n, child_square)
     
     def local_optimize(self):
         """
         Try up to  n  improving swaps between “heavy” rows/cols and
         “light” rows/cols.  The loop breaks early as soon as a swap really
         improves the fitness (greedy first-improvement local search).
+
+        Trial swaps are scored with swap_delta(), so nothing is rescanned
+        and a rejected swap never touches the board.
         """
         attempts = int(np.ceil(self.n))          # 1, 2, 3, …
         for _ in range(attempts):
-            original_fitness = self.get_fitness()
-
             # --- select heavy / light rows & cols once per attempt ----
-            row_sums = self.square.sum(axis=1)
-            col_sums = self.square.sum(axis=0)
+            row_sums, col_sums, _diag_sums = self.get_line_sums()
 
             max_row_idx = row_sums.argmax()
             min_row_idx = row_sums.argmin()
@@ -132,22 +311,22 @@ class MagicSquareChromosome:
             # -- row swap ------------------------------------------------
             if row_sums[max_row_idx] > self.m and row_sums[min_row_idx] < self.m:
                 j, k = np.random.randint(0, self.n, size=2)
-                self.square[max_row_idx, j], self.square[min_row_idx, k] = \
-                    self.square[min_row_idx, k], self.square[max_row_idx, j]
-                improved = self.get_fitness() < original_fitness
-                if not improved:      # undo if it hurt
-                    self.square[max_row_idx, j], self.square[min_row_idx, k] = \
-                        self.square[min_row_idx, k], self.square[max_row_idx, j]
+                improved = self.swap_delta(max_row_idx, j, min_row_idx, k) < 0
+                if improved:
+                    self.swap(max_row_idx, j, min_row_idx, k)
+                if PROFILER.enabled:
+                    PROFILER.count("swaps_attempted")
+                    PROFILER.count("swaps_accepted", int(improved))
 
             # -- column swap --------------------------------------------
             if not improved and col_sums[max_col_idx] > self.m and col_sums[min_col_idx] < self.m:
                 i, k = np.random.randint(0, self.n, size=2)
-                self.square[i, max_col_idx], self.square[k, min_col_idx] = \
-                    self.square[k, min_col_idx], self.square[i, max_col_idx]
-                improved = self.get_fitness() < original_fitness
-                if not improved:      # undo if it hurt
-                    self.square[i, max_col_idx], self.square[k, min_col_idx] = \
-                        self.square[k, min_col_idx], self.square[i, max_col_idx]
+                improved = self.swap_delta(i, max_col_idx, k, min_col_idx) < 0
+                if improved:
+                    self.swap(i, max_col_idx, k, min_col_idx)
+                if PROFILER.enabled:
+                    PROFILER.count("swaps_attempted")
+                    PROFILER.count("swaps_accepted", int(improved))
 
             if improved:      # greedy first-improvement
                 return 1
@@ -159,34 +338,8 @@ class MagicSquareChromosome:
         Fixes the missing numbers in the magic square.
         
         This method ensures that all numbers from 1 to n^2 are present in the square by replacing the ones that appear more than once with thouse who dont appear at all.
+        Later duplicates (row-major) get the missing numbers in ascending order, in linear time.
         """
-        numbers = list(range(1, self.n**2 + 1))
-        flat = self.get_flat()
-
-        seen = set()
-        duplicates = []
-        for num in flat:
-            if num in seen:
-                duplicates.append(num)
-            else:
-                seen.add(num)
-
-        missing = list(set(numbers) - seen)
-        missing.sort()
-
-        idx = 0
-        used = set()
-        for i in range(self.n):
-            for j in range(self.n):
-                val = self.square[i][j]
-                # If we've seen this number before and it's a duplicate
-                if val in used:
-                    self.square[i][j] = missing.pop(0)
-                else:
-                    used.add(val)
-
-
-
-
-
-    
\ No newline at end of file
+        self._make_writable()
+        self.square[...] = repair_permutations(self.square[None])[0]
+        self.invalidate_fitness()
@@ -0,0 +1,352 @@
+"""
+Headless runner for the magic square GA.
+
+    python -m magicsquare run --n 8 --most-perfect --strategy lamarckian --pop 2000 --max-gens 5000
+    python -m magicsquare portfolio --runs 8 --strategies regular,lamarckian --n 4 --most-perfect
+    python -m magicsquare sweep --results sweep.jsonl --param mutation_rate=0.05,0.1,0.2 --param state=0,2
+
+Runs a population manager at full speed without importing tkinter or
+matplotlib, prints one JSON object describing the result to stdout and
+exits with 0 if a perfect square was found and 1 otherwise. The portfolio
+command runs many seeded copies in a process pool and stops at the first
+solution, see portfolio.py. The sweep command runs every configuration of
+a grid or random search space for several seeds and appends each run to a
+resumable results file, see sweep.py. run --metrics PATH streams
+per-generation and per-island statistics to CSV or Parquet, see metrics.py.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from parallel_islands import ParallelIslandPopulationManagement
+from population_management import populationManagement
+from SeparatePopulationManagement import IslandPopulationManagement
+from selection import SELECTION_METHODS
+from crossover import CROSSOVERS
+from migration import EMIGRANT_POLICIES, TOPOLOGIES
+from local_search import LOCAL_SEARCHES
+from profiling import PROFILER
+from checkpoint import load_checkpoint
+from portfolio import portfolio_configs, run_portfolio
+from sweep import format_table, grid_space, random_space, run_sweep
+from metrics import MetricsSink
+
+STRATEGIES = {"regular": 0, "darwinian": 1, "lamarckian": 2}
+
+
+def manager_kwargs(args):
+    """
+    Returns the constructor arguments shared by every manager for the
+    parsed CLI arguments, plus the island settings when islands are used.
+    """
+    kwargs = dict(
+        state=STRATEGIES[args.strategy],
+        most_state=args.most_perfect,
+        mutation_rate=args.mutation_rate,
+        elitism=args.elitism,
+        engine=args.engine,
+        selection=args.selection,
+        tournament_size=args.tournament_size,
+        crossover=args.crossover,
+        local_search=args.local_search,
+        local_search_budget=args.local_search_budget,
+        deduplicate=args.deduplicate,
+        adaptive=args.adaptive,
+    )
+    if getattr(args, "parallel", False) or args.islands:
+        kwargs.update(num_islands=args.num_islands, topology=args.topology,
+                      emigrant_policy=args.emigrants, migration_interval=args.migration_interval,
+                      migration_rate=args.migration_rate)
+    return kwargs
+
+
+def build_manager(args):
+    """
+    Creates the population manager described by the parsed CLI arguments.
+    """
+    kwargs = manager_kwargs(args)
+    if args.parallel:
+        manager_cls = ParallelIslandPopulationManagement
+        kwargs.update(asynchronous=args.async_migration, seed=args.seed)
+    else:
+        manager_cls = IslandPopulationManagement if args.islands else populationManagement
+        kwargs.update(checkpoint_path=args.checkpoint, checkpoint_every=args.checkpoint_every if args.checkpoint else 0)
+    return manager_cls(args.n, args.pop, **kwargs)
+
+
+def run(manager, max_gens, report_every=0, cancel=None, metrics=None):
+    """
+    Evolves the manager until a perfect square appears, max_gens
+    generations have run or the optional cancel event is set, and returns
+    the result as a JSON-ready dict. An optional metrics.MetricsSink
+    records every generation (every chunk of a parallel run).
+    """
+    start = time.perf_counter()
+    best_fitness = None
+    parallel = isinstance(manager, ParallelIslandPopulationManagement)
+    while manager.get_generation() < max_gens and not (cancel is not None and cancel.is_set()):
+        if parallel:
+            # workers only synchronise at migration points, so hand them whole chunks
+            manager.evolve(min(report_every or max_gens, max_gens - manager.get_generation()))
+        else:
+            manager.evaluate_population()
+        if metrics is not None:
+            metrics.record(manager)
+        fitnesses = manager.get_fitnesses()
+        best_fitness = fitnesses.min()
+        if report_every and (parallel or manager.get_generation() % report_every == 0):
+            print(f"generation {manager.get_generation()}: best={best_fitness} "
+                  f"mean={fitnesses.mean():.2f}", file=sys.stderr)
+        if best_fitness == 0:
+            break
+    elapsed = time.perf_counter() - start
+
+    best = manager.get_best_chromosomes(0)[0]
+    fitness, board = best.get_fitness(), best.get_square()
+    adaptation = manager.adaptation
+    if adaptation is not None and adaptation.archive_fitness is not None and adaptation.archive_fitness < fitness:
+        # an adaptive restart replaced the best board found so far
+        fitness, board = adaptation.archive_fitness, adaptation.archive_board
+    generations = manager.get_generation()
+    return {
+        "solved": bool(fitness == 0),
+        "fitness": int(fitness),
+        "generation": generations,
+        "elapsed": elapsed,
+        "generations_per_sec": generations / elapsed if elapsed > 0 else None,
+        "board": board.tolist(),
+    }
+
+
+def _ga_arguments():
+    """Flags shared by the run and portfolio commands"""
+    ga = argparse.ArgumentParser(add_help=False)
+    ga.add_argument("--n", type=int, default=3, help="side length of the square")
+    ga.add_argument("--most-perfect", action="store_true", help="search for a most-perfect square")
+    ga.add_argument("--strategy", choices=sorted(STRATEGIES), default="regular")
+    ga.add_argument("--pop", type=int, default=100, help="population size")
+    ga.add_argument("--max-gens", type=int, default=500, help="generation limit")
+    ga.add_argument("--islands", action="store_true", help="use the island model")
+    ga.add_argument("--num-islands", type=int, default=4)
+    ga.add_argument("--topology", choices=TOPOLOGIES, default="shuffle",
+                    help="where emigrants go, see migration.py")
+    ga.add_argument("--emigrants", choices=EMIGRANT_POLICIES, default="worst",
+                    help="which chromosomes leave an island")
+    ga.add_argument("--migration-interval", type=int, default=100, metavar="GENS")
+    ga.add_argument("--migration-rate", type=float, default=1/6)
+    ga.add_argument("--mutation-rate", type=float, default=0.1)
+    ga.add_argument("--elitism", type=float, default=0.1)
+    ga.add_argument("--engine", choices=["object", "tensor"], default="tensor")
+    ga.add_argument("--selection", choices=sorted(SELECTION_METHODS), default="roulette")
+    ga.add_argument("--tournament-size", type=int, default=3)
+    ga.add_argument("--crossover", choices=sorted(CROSSOVERS), default="uniform")
+    ga.add_argument("--local-search", choices=LOCAL_SEARCHES, default="greedy",
+                    help="local search of the darwinian and lamarckian strategies, see local_search.py")
+    ga.add_argument("--local-search-budget", type=int, default=None, metavar="SWAPS",
+                    help="swap evaluations per board and generation for the non-greedy local searches")
+    ga.add_argument("--deduplicate", action="store_true",
+                    help="replace duplicate and symmetric boards every generation")
+    ga.add_argument("--adaptive", action="store_true",
+                    help="raise mutation and restart part of the population on stagnation")
+    ga.add_argument("--seed", type=int, default=None, help="seed both RNGs for a reproducible run")
+    return ga
+
+
+def _comma_list(convert):
+    def parse(text):
+        return [convert(item) for item in text.split(",")]
+    return parse
+
+
+def _parse_value(text):
+    # numbers and booleans as JSON, anything else (e.g. "tournament") as a string
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def _sweep_param(text):
+    """Parses NAME=V1,V2,... (choices) or NAME=LOW:HIGH (a range, random search only)"""
+    name, sep, values = text.partition("=")
+    if not sep or not name or not values:
+        raise argparse.ArgumentTypeError(f"expected NAME=V1,V2,... or NAME=LOW:HIGH, got {text!r}")
+    if ":" in values and "," not in values:
+        low, high = values.split(":", 1)
+        return name, (_parse_value(low), _parse_value(high))
+    return name, [_parse_value(value) for value in values.split(",")]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="magicsquare", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    ga = _ga_arguments()
+
+    run_parser = commands.add_parser("run", parents=[ga], help="run one GA to completion")
+    run_parser.add_argument("--parallel", action="store_true",
+                            help="evolve every island in its own process (implies --islands)")
+    run_parser.add_argument("--async-migration", action="store_true",
+                            help="with --parallel, exchange migrants without synchronising the islands")
+    run_parser.add_argument("--report-every", type=int, default=0, metavar="GENS",
+                            help="print progress to stderr every GENS generations")
+    run_parser.add_argument("--checkpoint", metavar="PATH", help="periodically save the run to this .npz file")
+    run_parser.add_argument("--checkpoint-every", type=int, default=100, metavar="GENS")
+    run_parser.add_argument("--resume", metavar="PATH",
+                            help="continue the run saved in a checkpoint (its settings replace the GA flags)")
+    run_parser.add_argument("--profile", action="store_true",
+                            help="time every GA phase and add the totals to the JSON output")
+    run_parser.add_argument("--profile-log", metavar="PATH",
+                            help="write one JSON line of phase timings and counters per generation (implies --profile)")
+    run_parser.add_argument("--metrics", metavar="PATH",
+                            help="write per-generation and per-island statistics to this .csv (or .parquet, "
+                                 "needs pyarrow) file; phase timings are included with --profile")
+    run_parser.add_argument("--metrics-flush", type=float, default=5.0, metavar="SECONDS",
+                            help="write buffered metrics rows at least this often")
+
+    portfolio_parser = commands.add_parser("portfolio", parents=[ga],
+                                           help="race independent GA runs and keep the first solution")
+    portfolio_parser.add_argument("--runs", type=int, default=os.cpu_count(),
+                                  help="number of independent runs (default: one per core)")
+    portfolio_parser.add_argument("--processes", type=int, default=None,
+                                  help="size of the process pool (default: one per core)")
+    portfolio_parser.add_argument("--strategies", type=_comma_list(str), default=None, metavar="LIST",
+                                  help="comma-separated strategies the runs cycle through")
+    portfolio_parser.add_argument("--mutation-rates", type=_comma_list(float), default=None, metavar="LIST",
+                                  help="comma-separated mutation rates the runs cycle through")
+    portfolio_parser.add_argument("--timeout", type=float, default=None, metavar="SECONDS",
+                                  help="cancel every run after this many seconds")
+
+    sweep_parser = commands.add_parser("sweep", parents=[ga],
+                                       help="run a grid or random search of GA settings over several seeds")
+    sweep_parser.add_argument("--results", required=True, metavar="PATH",
+                              help="JSON Lines file the runs are appended to; finished runs in it are skipped")
+    sweep_parser.add_argument("--param", type=_sweep_param, action="append", default=[], metavar="NAME=VALUES",
+                              help="a constructor argument to vary, e.g. mutation_rate=0.05,0.1 or, with "
+                                   "--samples, elitism=0.05:0.3; also manager=population,islands, N and size")
+    sweep_parser.add_argument("--samples", type=int, default=None,
+                              help="draw this many random configurations instead of the full grid")
+    sweep_parser.add_argument("--seeds", type=int, default=5, help="runs per configuration, seeded from --seed")
+    sweep_parser.add_argument("--processes", type=int, default=None,
+                              help="size of the process pool (default: one per core)")
+    return parser
+
+
+def _main_run(parser, args):
+    if (args.profile or args.profile_log) and args.parallel:
+        parser.error("--profile only covers the main process and cannot be combined with --parallel")
+    if (args.checkpoint or args.resume) and args.parallel:
+        parser.error("--checkpoint and --resume cannot be combined with --parallel")
+    if args.checkpoint_every < 1:
+        parser.error("--checkpoint-every must be positive")
+    if args.metrics_flush < 0:
+        parser.error("--metrics-flush must not be negative")
+
+    if args.seed is not None:
+        random.seed(args.seed)
+        np.random.seed(args.seed)
+
+    profile_log = open(args.profile_log, "w") if args.profile_log else None
+    if args.profile or profile_log:
+        PROFILER.enable(profile_log)
+
+    if args.resume:
+        # restores the RNG states as well, --seed does not apply
+        manager = load_checkpoint(args.resume)
+        if args.checkpoint:
+            manager.checkpoint_path = args.checkpoint
+            manager.checkpoint_every = args.checkpoint_every
+    else:
+        manager = build_manager(args)
+    metrics = MetricsSink(args.metrics, flush_seconds=args.metrics_flush) if args.metrics else None
+    try:
+        result = run(manager, args.max_gens, args.report_every, metrics=metrics)
+    finally:
+        if args.parallel:
+            manager.close()
+        if profile_log:
+            profile_log.close()
+        if metrics is not None:
+            metrics.close()
+    if PROFILER.enabled:
+        result["profile"] = PROFILER.snapshot()
+        PROFILER.disable()
+    return result
+
+
+def _main_portfolio(parser, args):
+    if args.runs < 1 or (args.processes is not None and args.processes < 1):
+        parser.error("--runs and --processes must be positive")
+    unknown = set(args.strategies or ()) - set(STRATEGIES)
+    if unknown:
+        parser.error(f"unknown strategies {sorted(unknown)}, expected some of {sorted(STRATEGIES)}")
+
+    base = dict(manager_kwargs(args), manager="islands" if args.islands else "population", N=args.n, size=args.pop)
+    vary = {}
+    if args.strategies:
+        vary["state"] = [STRATEGIES[name] for name in args.strategies]
+    if args.mutation_rates:
+        vary["mutation_rate"] = args.mutation_rates
+    configs = portfolio_configs(base, args.runs, seed=args.seed or 0, vary=vary)
+    portfolio = run_portfolio(configs, args.max_gens, args.processes, args.timeout)
+
+    result = dict(portfolio["runs"][portfolio["winner"]])
+    result["portfolio"] = {
+        "winner": portfolio["winner"],
+        "elapsed": portfolio["elapsed"],
+        "runs": [{key: value for key, value in run_result.items() if key != "board"}
+                 for run_result in portfolio["runs"]],
+    }
+    return result
+
+
+def _main_sweep(parser, args):
+    if args.seeds < 1 or (args.samples is not None and args.samples < 1):
+        parser.error("--seeds and --samples must be positive")
+    space = dict(args.param)
+    if args.samples is None:
+        if any(isinstance(values, tuple) for values in space.values()):
+            parser.error("LOW:HIGH ranges need --samples")
+        configs = grid_space(space)
+    else:
+        configs = random_space(space, args.samples, seed=args.seed or 0)
+
+    base = dict(manager_kwargs(args), manager="islands" if args.islands else "population", N=args.n, size=args.pop)
+    first_seed = args.seed or 0
+    rows = run_sweep(base, configs, range(first_seed, first_seed + args.seeds), args.max_gens,
+                     args.results, args.processes)
+    print(format_table(rows), file=sys.stderr)
+    return {"solved": any(row["success_rate"] > 0 for row in rows), "results": args.results, "sweep": rows}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.most_perfect and args.n % 4 != 0:
+        parser.error("most-perfect magic squares only exist for n divisible by 4")
+    if args.n < 3 or args.pop <= 0 or args.max_gens <= 0:
+        parser.error("--n must be at least 3, --pop and --max-gens must be positive")
+    if args.num_islands < 1 or args.migration_interval < 1:
+        parser.error("--num-islands and --migration-interval must be positive")
+    if args.local_search_budget is not None and args.local_search_budget < 1:
+        parser.error("--local-search-budget must be positive")
+
+    if args.command == "portfolio":
+        result = _main_portfolio(parser, args)
+    elif args.command == "sweep":
+        result = _main_sweep(parser, args)
+    else:
+        result = _main_run(parser, args)
+    result["config"] = {key: value for key, value in vars(args).items() if key != "command"}
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 0 if result["solved"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Per-generation metrics export for long headless runs.
+
+MetricsSink.record(manager) appends one row for the whole population and,
+for island managers, one row per island (fitness statistics, diversity,
+evaluations, elapsed time and, while the profiler is enabled, the seconds
+each GA phase took in that generation). Rows are buffered in memory and
+written in batches, to CSV or, for a path ending in .parquet, to Parquet
+through pyarrow (one row group per batch). A batch is written once
+buffer_rows rows are waiting or flush_seconds have passed since the last
+write, and on close().
+"""
+import csv
+import time
+
+import numpy as np
+
+from population_tensor import population_diversity
+from profiling import PROFILER
+
+# phases of one generation, see profiling.py
+PHASES = ("elitism", "clone", "local_optimize", "selection", "crossover", "mutation", "deduplicate",
+          "adaptation", "pack", "migration", "checkpoint")
+COLUMNS = ("generation", "island", "size", "best", "mean", "worst", "std", "diversity", "evaluations",
+           "elapsed") + tuple(f"{phase}_seconds" for phase in PHASES)
+# island value of the rows that cover the whole population
+ALL_ISLANDS = -1
+
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="", buffering=1 << 16)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Writing metrics to Parquet needs pyarrow; use a .csv path instead.") from exc
+        self.pa = pa
+        types = {"generation": pa.int64(), "island": pa.int64(), "size": pa.int64(), "evaluations": pa.int64()}
+        self.schema = pa.schema([(name, types.get(name, pa.float64())) for name in COLUMNS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class MetricsSink:
+    """
+    Buffered per-generation metrics writer, see the module docstring.
+    Use it as a context manager or call close() to write the last batch.
+    """
+
+    def __init__(self, path, buffer_rows=1000, flush_seconds=5.0, diversity=True):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.flush_seconds = flush_seconds
+        self.diversity = diversity
+        self._writer = _ParquetWriter(path) if path.endswith(".parquet") else _CsvWriter(path)
+        self._rows = []
+        self._start = time.perf_counter()
+        self._last_flush = self._start
+        self._phase_mark = dict(PROFILER.seconds)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _row(self, generation, island, fitnesses, boards, evaluations, elapsed, phases):
+        diversity = population_diversity(boards) if boards is not None else None
+        return (generation, island, len(fitnesses), fitnesses.min().item(), float(fitnesses.mean()),
+                fitnesses.max().item(), float(fitnesses.std()), diversity, evaluations, elapsed) + phases
+
+    def _boards(self, population, boards):
+        if not self.diversity:
+            return None
+        if boards is None:
+            boards = np.stack([chrom.square for chrom in population])
+        return boards
+
+    def record(self, manager):
+        """Buffers the rows of the manager's current generation and writes a batch when one is due"""
+        now = time.perf_counter()
+        elapsed = now - self._start
+        generation = manager.get_generation()
+        if PROFILER.enabled:
+            seconds = PROFILER.seconds
+            phases = tuple(seconds.get(phase, 0.0) - self._phase_mark.get(phase, 0.0) for phase in PHASES)
+            self._phase_mark = dict(seconds)
+        else:
+            phases = (None,) * len(PHASES)
+
+        population = manager.get_population()
+        self._rows.append(self._row(generation, ALL_ISLANDS, manager.get_fitnesses(),
+                                    self._boards(population, manager.get_boards()),
+                                    manager.evaluations, elapsed, phases))
+        if hasattr(manager, "islands"):
+            no_phases = (None,) * len(PHASES)
+            for island_idx, island in enumerate(manager.islands):
+                self._rows.append(self._row(generation, island_idx, manager.get_island_fitnesses(island_idx),
+                                            self._boards(island, manager.get_island_boards(island_idx)),
+                                            None, elapsed, no_phases))
+
+        if len(self._rows) >= self.buffer_rows or now - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows"""
+        if self._rows:
+            self._writer.write(self._rows)
+            self._rows = []
+        self._last_flush = time.perf_counter()
+
+    def close(self):
+        self.flush()
+        self._writer.close()
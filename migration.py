@@ -0,0 +1,94 @@
+from math import isqrt
+
+import numpy as np
+
+# "shuffle" pools every island's emigrants and deals them out at random
+# (the original behaviour); the other topologies send each island's
+# emigrants to one neighbour per migration.
+TOPOLOGIES = ("shuffle", "ring", "torus", "full", "random")
+EMIGRANT_POLICIES = ("worst", "best", "random")
+
+
+def check_migration(num_islands, topology, emigrant_policy):
+    """
+    Raises ValueError for an invalid island count, topology or emigrant policy.
+    """
+    if num_islands < 1:
+        raise ValueError(f"num_islands must be at least 1, got {num_islands}.")
+    if topology not in TOPOLOGIES:
+        raise ValueError(f"Unknown topology {topology!r}, expected one of {list(TOPOLOGIES)}.")
+    if emigrant_policy not in EMIGRANT_POLICIES:
+        raise ValueError(f"Unknown emigrant policy {emigrant_policy!r}, expected one of {list(EMIGRANT_POLICIES)}.")
+
+
+def torus_shape(num_islands):
+    """
+    Returns the (rows, cols) grid closest to square that holds the islands.
+    """
+    rows = max(d for d in range(1, isqrt(num_islands) + 1) if num_islands % d == 0)
+    return rows, num_islands // rows
+
+
+def migration_targets(topology, num_islands, epoch):
+    """
+    Returns an array whose entry i is the island that island i sends its
+    emigrants to at the given migration epoch.
+
+    Every result is a permutation, so each island receives exactly one
+    batch and island sizes stay constant:
+      ring   - always the next island
+      torus  - the east, south, west and north grid neighbour in turn; a
+               prime island count only fits a single row, which has no
+               north/south neighbours, so it alternates east and west
+      full   - every other island in turn
+      random - a random derangement
+    """
+    islands = np.arange(num_islands)
+    if num_islands == 1:
+        return islands
+    if topology == "ring":
+        return (islands + 1) % num_islands
+    if topology == "full":
+        return (islands + 1 + epoch % (num_islands - 1)) % num_islands
+    if topology == "torus":
+        rows, cols = torus_shape(num_islands)
+        row, col = divmod(islands, cols)
+        directions = ((0, 1), (1, 0), (0, -1), (-1, 0)) if rows > 1 else ((0, 1), (0, -1))
+        d_row, d_col = directions[epoch % len(directions)]
+        return ((row + d_row) % rows) * cols + (col + d_col) % cols
+    if topology == "random":
+        while True:
+            targets = np.random.permutation(num_islands)
+            if (targets != islands).all():
+                return targets
+    raise ValueError(f"Topology {topology!r} has no fixed targets.")
+
+
+def migration_target(topology, num_islands, epoch, island_idx):
+    """
+    Returns the island a single island sends to when it migrates on its
+    own (asynchronous migration). Topologies without a fixed neighbour pick
+    a random other island.
+    """
+    if topology in ("shuffle", "random"):
+        if num_islands == 1:
+            return island_idx
+        target = np.random.randint(num_islands - 1)
+        return target + (target >= island_idx)
+    return int(migration_targets(topology, num_islands, epoch)[island_idx])
+
+
+def select_emigrants(fitnesses, count, policy="worst"):
+    """
+    Returns the indices of the count chromosomes that leave an island.
+
+    "worst" and "best" keep the order of a stable sort (worst or best
+    first), "random" samples without replacement.
+    """
+    fitnesses = np.asarray(fitnesses)
+    count = min(count, len(fitnesses))
+    if policy == "worst":
+        return np.argsort(-fitnesses, kind="stable")[:count]
+    if policy == "best":
+        return np.argsort(fitnesses, kind="stable")[:count]
+    return np.random.choice(len(fitnesses), size=count, replace=False)
@@ -1,80 +1,132 @@
 from magic_square_chromosome import MagicSquareChromosome
 import numpy as np
 
+
+def subsquare_penalty(boards):
+    """
+    Sums |block - 2s| over all n^2 wraparound 2x2 blocks of one (n, n)
+    board or of every board in a (..., n, n) stack.
+
+    Each block sum is one cell plus its right, lower and lower-right
+    neighbours, so the whole stack is handled with three rolled copies.
+    """
+    boards = np.asarray(boards, dtype=np.int64)
+    n = boards.shape[-1]
+    right = np.roll(boards, -1, axis=-1)
+    blocks = boards + right + np.roll(boards, -1, axis=-2) + np.roll(right, -1, axis=-2)
+    return np.abs(blocks - 2 * (n**2 + 1)).sum(axis=(-2, -1))
+
+
+def diagonal_pair_penalty(boards):
+    """
+    Sums |a + b - s| over the cells n/2 apart (wraparound) on both
+    diagonals of one (n, n) board or of every board in a (..., n, n) stack.
+    Like the loop it replaces, every pair is visited from both ends.
+    """
+    boards = np.asarray(boards, dtype=np.int64)
+    n = boards.shape[-1]
+    s = n**2 + 1
+    fitness = 0
+    for diagonal in (np.diagonal(boards, axis1=-2, axis2=-1),
+                     np.diagonal(boards[..., ::-1], axis1=-2, axis2=-1)):
+        pairs = diagonal + np.roll(diagonal, -(n // 2), axis=-1)
+        fitness = fitness + np.abs(pairs - s).sum(axis=-1)
+    return fitness
+
+
 class MostPerfectMagicSquareChromosome(MagicSquareChromosome):
-    def __init__(self, n):
-        super().__init__(n)
+    __slots__ = ("s",)
+
+    def __init__(self, n, square=None):
         if n % 4 != 0:
             raise ValueError("Most-perfect magic squares only exist for n divisible by 4.")
+        super().__init__(n, square)
         self.s = n**2 + 1  # For 2x2 subsquares and diagonal pairs
     
-    def clone(self):
+    def _compute_fitness(self):
         """
-        Clones the current chromosome.
-        """
-        clone = MostPerfectMagicSquareChromosome(self.n)
-        clone.square = np.copy(self.square)
-        return clone
-
-    def get_fitness(self):
-        """
-        Returns the fitness of the chromosome based on:
+        Computes the fitness of the chromosome based on:
         - Standard magic square rules (rows/cols/diagonals = m)
         - 2x2 subsquares (wraparound) summing to 2s
         - Diagonal pairs (n/2 apart, wraparound) summing to s
         """
-        fitness = super().get_fitness() + self.check_2x2_subsquares() + self.check_diagonal_pairs_n_2_apart()
+        fitness = super()._compute_fitness() + self.check_2x2_subsquares() + self.check_diagonal_pairs_n_2_apart()
         return fitness
+
+    @classmethod
+    def batch_fitness(cls, boards):
+        """
+        Returns the most-perfect fitness of every board in a (P, n, n) stack.
+        """
+        return super().batch_fitness(boards) + subsquare_penalty(boards) + diagonal_pair_penalty(boards)
+
+    @classmethod
+    def constraint_matrix(cls, n):
+        """
+        Adds one constraint per wraparound 2x2 block (target 2s) and per
+        diagonal cell and its partner n/2 further on (target s), so every
+        diagonal pair appears twice, as in the fitness.
+        """
+        A, targets = super().constraint_matrix(n)
+        cells = np.arange(n * n).reshape(n, n)
+        right = np.roll(cells, -1, axis=1)
+        blocks = np.stack([cells, right, np.roll(cells, -1, axis=0), np.roll(right, -1, axis=0)], axis=-1)
+        groups = [block for block in blocks.reshape(n * n, 4)]
+        for diagonal in (np.diagonal(cells), np.diagonal(cells[:, ::-1])):
+            groups.extend(np.stack([diagonal, np.roll(diagonal, -(n // 2))], axis=-1))
+        extra = np.zeros((len(groups), n * n), dtype=np.int8)
+        for k, group in enumerate(groups):
+            extra[k, group] = 1
+        s = n**2 + 1
+        extra_targets = np.array([2 * s] * (n * n) + [s] * (len(groups) - n * n), dtype=np.int64)
+        return np.concatenate([A, extra]), np.concatenate([targets, extra_targets])
+
+    def swap_delta(self, i, j, k, l):
+        """
+        Returns the change in fitness that swapping cells (i, j) and (k, l)
+        would cause. On top of the line sums only the (at most eight) 2x2
+        blocks and the diagonal pairs holding either cell are rescored.
+        """
+        delta = super().swap_delta(i, j, k, l)
+        a, b = (i, j), (k, l)
+        if a == b:
+            return delta
+        n = self.n
+        square = self.square
+        va, vb = int(square[a]), int(square[b])
+
+        def before(cell):
+            return int(square[cell])
+
+        def after(cell):
+            return vb if cell == a else va if cell == b else int(square[cell])
+
+        # 2x2 blocks are keyed by their top-left corner
+        blocks = {((r - dr) % n, (c - dc) % n)
+                  for r, c in (a, b) for dr in (0, 1) for dc in (0, 1)}
+        for r, c in blocks:
+            cells = (r, c), (r, (c + 1) % n), ((r + 1) % n, c), ((r + 1) % n, (c + 1) % n)
+            old = sum(before(cell) for cell in cells)
+            new = sum(after(cell) for cell in cells)
+            delta += abs(new - 2 * self.s) - abs(old - 2 * self.s)
+
+        # every n/2-apart diagonal pair is counted twice by the fitness
+        half_n = n // 2
+        pairs = set()
+        for r, c in (a, b):
+            r2 = (r + half_n) % n
+            if r == c:
+                pairs.add(((r, r), (r2, r2)) if r < r2 else ((r2, r2), (r, r)))
+            if r + c == n - 1:
+                pairs.add(((r, c), (r2, n - 1 - r2)) if r < r2 else ((r2, n - 1 - r2), (r, c)))
+        for cells in pairs:
+            old = sum(before(cell) for cell in cells)
+            new = sum(after(cell) for cell in cells)
+            delta += 2 * (abs(new - self.s) - abs(old - self.s))
+        return int(delta)
     
     def check_2x2_subsquares(self):
-        fitness = 0
-        for i in range(self.n):
-            for j in range(self.n):
-                a = self.square[i][j]
-                b = self.square[i][(j + 1) % self.n]
-                c = self.square[(i + 1) % self.n][j]
-                d = self.square[(i + 1) % self.n][(j + 1) % self.n]
-                block_sum = a + b + c + d
-                fitness += abs(block_sum - (2 * self.s))
-        return fitness
+        return subsquare_penalty(self.square)
 
     def check_diagonal_pairs_n_2_apart(self):
-        half_n = self.n // 2
-        fitness = 0
-        for i in range(self.n):
-            j = i
-            j_opposite = (i + half_n) % self.n
-            # Main diagonal pair
-            val1 = self.square[i][i]
-            val2 = self.square[j_opposite][j_opposite]
-            fitness += abs((val1 + val2) - self.s)
-
-            # Anti-diagonal pair
-            val3 = self.square[i][self.n - 1 - i]
-            val4 = self.square[j_opposite][self.n - 1 - j_opposite]
-            fitness += abs((val3 + val4) - self.s)
-        return fitness
-    
-    def cross_over(self, other):
-        """
-        Performs crossover between this chromosome and another chromosome.
-        
-        The crossover operation creates a new chromosome by selecting each element
-        from either this chromosome or the other chromosome with equal probability.
-        
-        Args:
-            other: Another MagicSquareChromosome to cross over with
-            
-        Returns:
-            A new MagicSquareChromosome resulting from the crossover
-        """
-        child = MostPerfectMagicSquareChromosome(self.n)
-        for i in range(self.n):
-            for j in range(self.n):
-                if np.random.rand() < 0.5:
-                    child.square[i][j] = self.square[i][j]
-                else:
-                    child.square[i][j] = other.square[i][j]
-
-        child.fix_missing_numbers()
-        return child
+        return diagonal_pair_penalty(self.square)
@@ -0,0 +1,312 @@
+import multiprocessing as mp
+import queue
+import random
+import traceback
+
+import numpy as np
+
+from magic_square_chromosome import MagicSquareChromosome, board_dtype
+from most_perfect_magic_square_chromosome import MostPerfectMagicSquareChromosome
+from population_tensor import pack_population
+from SeparatePopulationManagement import IslandPopulationManagement
+from migration import migration_target, select_emigrants
+
+
+def _chromosomes_from_boards(n, most_state, boards, fitnesses=None):
+    """Wrap the boards of a (P, n, n) array as chromosome views"""
+    chromosome_cls = MostPerfectMagicSquareChromosome if most_state else MagicSquareChromosome
+    chromosomes = [chromosome_cls(n, board) for board in boards]
+    if fitnesses is not None:
+        for chrom, fitness in zip(chromosomes, fitnesses):
+            chrom.set_cached_fitness(fitness)
+    return chromosomes
+
+
+def _stack_boards(boards, n):
+    """Stack a list of single boards (possibly empty) into one array"""
+    if not boards:
+        return np.empty((0, n, n), dtype=board_dtype(n))
+    return np.stack(boards)
+
+
+def _snapshot(manager):
+    """
+    Pack the worker's island and return (boards, fitnesses, archive) for the
+    coordinator, archive being the adaptive controller's (fitness, board)
+    of the best board found so far, or None.
+    """
+    boards = pack_population(manager.islands[0])
+    manager.island_boards[0] = boards if manager.engine == "tensor" else None
+    adaptation = manager.adaptation
+    archive = None
+    if adaptation is not None and adaptation.archive_fitness is not None:
+        archive = (adaptation.archive_fitness, adaptation.archive_board)
+    return boards, manager.get_island_fitnesses(0), archive
+
+
+def _receive_immigrants(manager, inbox):
+    """Let whatever immigrants have arrived replace the worst chromosomes"""
+    n, most_state = manager.N, manager.most_state
+    island = manager.islands[0]
+    while True:
+        try:
+            boards = inbox.get_nowait()
+        except queue.Empty:
+            return
+        worst = select_emigrants(manager.get_island_fitnesses(0), len(boards), "worst")
+        for i, chrom in zip(worst, _chromosomes_from_boards(n, most_state, boards)):
+            island[i] = chrom
+        manager._pack_island(0)
+
+
+def _send_emigrants(manager, inboxes, island_idx, count):
+    """Post copies of this island's emigrants to the inbox of its current target"""
+    island = manager.islands[0]
+    chosen = select_emigrants(manager.get_island_fitnesses(0), count, manager.emigrant_policy)
+    target = migration_target(manager.topology, len(inboxes), manager.migration_epoch, island_idx)
+    manager.migration_epoch += 1
+    if target != island_idx:
+        inboxes[target].put(np.stack([island[i].square for i in chosen]))
+
+
+def _island_worker(commands, results, island_idx, config, boards, seed, inboxes=None, solved=None):
+    """
+    Body of a worker process that owns one island.
+
+    Commands arrive on ``commands``:
+      ("evolve", generations, emigrants) - evolve, then remove the
+          ``emigrants`` chosen by the emigrant policy and send them back
+      ("immigrate", boards) - adopt the incoming boards and reply with a
+          snapshot (boards, fitnesses, archive) of the island
+      ("run", generations, generation, interval, emigrants, stop_at_solution)
+          - evolve with asynchronous migration: every ``interval``
+          generations copies of the emigrants are posted straight to the
+          target island's inbox, and arrivals replace the worst chromosomes
+          whenever they show up. With stop_at_solution every island stops
+          as soon as one of them sets the shared ``solved`` event. Replies
+          with a snapshot plus the number of generations actually run.
+      ("stop",) - leave the loop
+    Every reply on ``results`` is tagged with the island index.
+    """
+    try:
+        random.seed(seed)
+        np.random.seed(seed)
+        n, most_state = config["N"], config["most_state"]
+        island = _chromosomes_from_boards(n, most_state, boards)
+        manager = IslandPopulationManagement(islands=[island], **config)
+
+        while True:
+            command = commands.get()
+            if command[0] == "evolve":
+                _, generations, emigrants = command
+                for _ in range(generations):
+                    manager._evaluate_island(0)
+                    manager._deduplicate()
+                    manager._adapt()
+                leaving = manager._take_emigrants(0, emigrants) if emigrants else []
+                results.put((island_idx, "emigrants", _stack_boards([chrom.square for chrom in leaving], n)))
+            elif command[0] == "immigrate":
+                manager.islands[0].extend(_chromosomes_from_boards(n, most_state, command[1]))
+                results.put((island_idx, "snapshot", _snapshot(manager)))
+            elif command[0] == "run":
+                _, generations, generation, interval, emigrants, stop_at_solution = command
+                manager.generation = generation
+                ran = 0
+                while ran < generations and not (stop_at_solution and solved.is_set()):
+                    _receive_immigrants(manager, inboxes[island_idx])
+                    manager._evaluate_island(0)
+                    manager._deduplicate()
+                    manager._adapt()
+                    if manager.generation % interval == 0:
+                        _send_emigrants(manager, inboxes, island_idx, emigrants)
+                    manager.generation += 1
+                    ran += 1
+                    if stop_at_solution and manager.get_island_best_fitness(0) == 0:
+                        solved.set()
+                results.put((island_idx, "ran", _snapshot(manager) + (ran,)))
+            elif command[0] == "stop":
+                break
+    except Exception:
+        results.put((island_idx, "error", traceback.format_exc()))
+    finally:
+        # undelivered immigrants must not keep this process from exiting
+        for inbox in inboxes or ():
+            inbox.cancel_join_thread()
+
+
+class ParallelIslandPopulationManagement(IslandPopulationManagement):
+    """
+    Island model where every island evolves in its own worker process.
+
+    Islands only meet at migration points, so each worker runs its island
+    on its own core between them. At a migration the workers send their
+    emigrants to this coordinator, which routes them along the topology
+    exactly like IslandPopulationManagement.migrate_population, and then
+    sends back the incoming boards. After every call the coordinator
+    holds a snapshot of all islands, so the usual getters keep working.
+
+    evaluate_population() advances a single generation; evolve(k) runs k
+    generations with one synchronisation per migration interval and is
+    the fast path. With asynchronous=True there is no synchronisation at
+    all inside evolve(k): each worker posts copies of its emigrants
+    straight into its target island's inbox and takes in arrivals
+    (replacing its worst chromosomes) whenever they show up.
+
+    Call close() (or use the manager as a context manager) to stop the
+    workers.
+    """
+
+    def __init__(self, N, size, state=0, most_state=False, mutation_rate=0.1, elitism=0.1, engine="tensor",
+                 selection="roulette", tournament_size=3, num_islands=4, topology="shuffle",
+                 emigrant_policy="worst", migration_interval=100, migration_rate=1/6,
+                 crossover="uniform", asynchronous=False, seed=None, timeout=None, local_search="greedy",
+                 local_search_budget=None, deduplicate=False, adaptive=False):
+        super().__init__(N, size, state, most_state, mutation_rate, elitism, engine,
+                         selection, tournament_size, num_islands=num_islands, topology=topology,
+                         emigrant_policy=emigrant_policy, migration_interval=migration_interval,
+                         migration_rate=migration_rate, crossover=crossover, local_search=local_search,
+                         local_search_budget=local_search_budget, deduplicate=deduplicate, adaptive=adaptive)
+        self.asynchronous = asynchronous
+        self.timeout = timeout
+        config = dict(N=N, size=self.island_size, state=state, most_state=most_state,
+                      mutation_rate=mutation_rate, elitism=elitism, engine=engine,
+                      selection=selection, tournament_size=tournament_size, num_islands=1,
+                      topology=topology, emigrant_policy=emigrant_policy, crossover=crossover,
+                      local_search=local_search, local_search_budget=local_search_budget,
+                      deduplicate=deduplicate, adaptive=adaptive)
+
+        # worker seeds come from the coordinator's RNG unless given explicitly
+        if seed is None:
+            seeds = np.random.randint(0, 2**31 - 1, size=len(self.islands))
+        else:
+            seeds = [seed + i for i in range(len(self.islands))]
+
+        context = mp.get_context()
+        self._results = context.Queue()
+        self._inboxes = [context.Queue() for _ in self.islands] if asynchronous else None
+        self._solved = context.Event() if asynchronous else None
+        self._commands = []
+        self._workers = []
+        for idx, island in enumerate(self.islands):
+            commands = context.Queue()
+            worker = context.Process(
+                target=_island_worker,
+                args=(commands, self._results, idx, config,
+                      _stack_boards([chrom.square for chrom in island], N), int(seeds[idx]),
+                      self._inboxes, self._solved),
+                daemon=True,
+            )
+            worker.start()
+            self._commands.append(commands)
+            self._workers.append(worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop and join the worker processes"""
+        for commands, worker in zip(self._commands, self._workers):
+            if worker.is_alive():
+                commands.put(("stop",))
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._commands = []
+
+    def _gather(self, kind):
+        """Collect one reply of the given kind from every worker, ordered by island"""
+        replies = [None] * len(self._workers)
+        for _ in self._workers:
+            while True:
+                try:
+                    island_idx, reply_kind, payload = self._results.get(timeout=self.timeout or 1)
+                    break
+                except queue.Empty:
+                    if self.timeout or not all(worker.is_alive() for worker in self._workers):
+                        raise RuntimeError("An island worker stopped responding.")
+            if reply_kind == "error":
+                raise RuntimeError(f"Island worker {island_idx} failed:\n{payload}")
+            assert reply_kind == kind
+            replies[island_idx] = payload
+        return replies
+
+    def _run_chunk(self, generations, migrate):
+        """Evolve every island for some generations, then exchange migrants"""
+        if not self._workers:
+            raise RuntimeError("The island workers have been closed.")
+        emigrants = self.get_migration_size() if migrate else 0
+        for commands in self._commands:
+            commands.put(("evolve", generations, emigrants))
+
+        outgoing = [list(boards) for boards in self._gather("emigrants")]
+        if migrate:
+            incoming = self._route_migrants(outgoing)
+        else:
+            incoming = outgoing
+        for commands, boards in zip(self._commands, incoming):
+            commands.put(("immigrate", _stack_boards(boards, self.N)))
+        self._apply_snapshots(self._gather("snapshot"))
+
+    def _apply_snapshots(self, snapshots):
+        """Replace the local copy of every island by the boards a worker reported"""
+        for idx, (boards, fitnesses, archive) in enumerate(snapshots):
+            self.islands[idx] = _chromosomes_from_boards(self.N, self.most_state, boards, fitnesses)
+            self.island_boards[idx] = boards if self.engine == "tensor" else None
+            # the workers' controllers act on their own; collect their best boards here
+            if archive is not None:
+                self.adaptation.archive(*archive)
+
+    def _run_async(self, generations, stop_at_solution):
+        """Let every worker run on its own with inbox-based migration"""
+        if not self._workers:
+            raise RuntimeError("The island workers have been closed.")
+        self._solved.clear()
+        for commands in self._commands:
+            commands.put(("run", generations, self.generation, self.migration_interval,
+                          self.get_migration_size(), stop_at_solution))
+        replies = self._gather("ran")
+        self._apply_snapshots([reply[:3] for reply in replies])
+        # islands stopped by another island's solution ran fewer generations
+        self.generation += max(reply[3] for reply in replies)
+        self.evaluations += sum(reply[3] for reply in replies) * self._island_offspring()
+
+    def evolve(self, generations, stop_at_solution=True):
+        """
+        Run the given number of generations, synchronising with the workers
+        only at migration points (or not at all in asynchronous mode).
+        Returns early once a perfect square appeared when stop_at_solution
+        is set.
+        """
+        if self.asynchronous:
+            self._run_async(generations, stop_at_solution)
+            return
+        remaining = generations
+        while remaining > 0:
+            # migration follows the generation whose number is a multiple of the interval
+            until_migration = (-self.generation) % self.migration_interval
+            chunk = min(remaining, until_migration + 1)
+            self._run_chunk(chunk, migrate=(chunk == until_migration + 1))
+            self.generation += chunk
+            self.evaluations += chunk * len(self.islands) * self._island_offspring()
+            remaining -= chunk
+            if stop_at_solution and self.get_overall_best_fitness() == 0:
+                break
+
+    def _island_offspring(self):
+        """Children a worker creates per generation, all but the island's elites"""
+        return self.island_size - max(1, int(self.elitism * self.island_size))
+
+    def evaluate_population(self):
+        """Evolve every island by one generation and migrate when due"""
+        self.evolve(1, stop_at_solution=False)
+
+    def migrate_population(self):
+        """Migration happens inside the workers' evolve cycle, never on its own"""
+        raise RuntimeError("Parallel islands migrate as part of evolve(); "
+                           "use IslandPopulationManagement to migrate on demand.")
+
@@ -1,19 +1,66 @@
 import numpy as np
-from magic_square_chromosome import MagicSquareChromosome
+from magic_square_chromosome import MagicSquareChromosome, random_boards
 from most_perfect_magic_square_chromosome import MostPerfectMagicSquareChromosome
+from population_tensor import pack_population, population_fitness
+from selection import check_selection, select_parent_pairs
+from crossover import check_crossover, cross_over_pairs
+from profiling import PROFILER
+from checkpoint import save_checkpoint
+from local_search import check_local_search, optimize_population
+from symmetry import SymmetryIndex
+from streaming import run_manager
+from adaptive import AdaptiveMutation, replace_worst
 import random
 
 class populationManagement:
-    def __init__(self, N, size ,state = 0, most_state = False, mutation_rate = 0.1, elitism = 0.1):
-        if most_state:
-            self.population = [MostPerfectMagicSquareChromosome(N) for i in range(size)]
+    def __init__(self, N, size ,state = 0, most_state = False, mutation_rate = 0.1, elitism = 0.1, engine = "object",
+                 selection = "roulette", tournament_size = 3, crossover = "uniform", population = None,
+                 checkpoint_path = None, checkpoint_every = 0, local_search = "greedy", local_search_budget = None,
+                 deduplicate = False, adaptive = False):
+        if engine not in ("object", "tensor"):
+            raise ValueError(f"Unknown engine {engine!r}, expected 'object' or 'tensor'.")
+        check_selection(selection)
+        check_crossover(crossover)
+        check_local_search(local_search)
+        if population is not None:
+            # adopt a ready-made population (e.g. one restored from a checkpoint)
+            self.population = list(population)
         else:
-            self.population = [MagicSquareChromosome(N) for i in range(size)]
+            chromosome_cls = MostPerfectMagicSquareChromosome if most_state else MagicSquareChromosome
+            # one draw for every board; each chromosome is a view into it
+            self.population = [chromosome_cls(N, board) for board in random_boards(size, N)]
+        self.N = N
         self.generation = 0
+        # individuals created so far, the unit of an evaluation budget
+        self.evaluations = len(self.population)
         self.state = state
         self.mutation_rate = mutation_rate
         self.elitism = elitism
         self.size = size
+        # "tensor" keeps every board in one (P, n, n) array and scores the
+        # whole population with one batched kernel
+        self.engine = engine
+        self.boards = None
+        self._pack()
+        # "roulette", "sus" or "tournament"
+        self.selection = selection
+        self.tournament_size = tournament_size
+        # "uniform", "pmx" or "cycle"
+        self.crossover = crossover
+        # "greedy", "steepest", "tabu" or "anneal" for states 1 and 2, with
+        # an optional budget of swap evaluations per board, see local_search.py
+        self.local_search = local_search
+        self.local_search_budget = local_search_budget
+        # replace duplicates and symmetric twins every generation, see symmetry.py
+        self.deduplicate = deduplicate
+        self.symmetry_index = SymmetryIndex() if deduplicate else None
+        # raise the mutation intensity and restart part of the population
+        # when the run stagnates, see adaptive.py
+        self.adaptive = adaptive
+        self.adaptation = AdaptiveMutation() if adaptive else None
+        # save_checkpoint() to checkpoint_path every checkpoint_every generations
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = checkpoint_every
 
     # getters
     def get_population(self):
@@ -26,14 +73,27 @@ class populationManagement:
     def get_generation(self):
         return self.generation
     
+    def get_boards(self):
+        """Returns the (P, n, n) population array, or None in object mode."""
+        return self.boards
+
+    def get_fitnesses(self):
+        """Returns the fitness of every chromosome as one array."""
+        return population_fitness(self.population, self.boards)
+
+    def _pack(self):
+        # chromosomes become views into a fresh contiguous board array
+        self.boards = pack_population(self.population) if self.engine == "tensor" else None
+    
     def get_best_chromosomes(self, rate = 0.1):
-        sorted_pop = sorted(self.population,key=lambda c: c.get_fitness())
-        k = max(1, int(rate * len(sorted_pop)))
-        return sorted_pop[:k]
+        # stable argsort keeps the same tie order as sorted()
+        order = np.argsort(self.get_fitnesses(), kind="stable")
+        k = max(1, int(rate * len(order)))
+        return [self.population[i] for i in order[:k]]
     
     def select_parent(self):
         # roulette wheel
-        fitnesses = np.array([c.get_fitness() for c in self.population], dtype=float)
+        fitnesses = self.get_fitnesses().astype(float)
         max_fitness = np.max(fitnesses)
         fitnesses = max_fitness - fitnesses
         total = fitnesses.sum()
@@ -45,50 +105,95 @@ class populationManagement:
               if hasattr(self, 'rng') else \
               np.random.choice(len(self.population), p=probs)
         return self.population[idx]
+
+    def select_parents(self, num_pairs, fitnesses=None):
+        """
+        Draws all parent pairs of a generation from one fitness vector,
+        by default the population's own fitness.
+        """
+        if fitnesses is None:
+            fitnesses = self.get_fitnesses()
+        pairs = select_parent_pairs(fitnesses, num_pairs, self.selection, self.tournament_size)
+        return [(self.population[i], self.population[j]) for i, j in pairs]
     
+    def _mutation_intensity(self):
+        """Returns the mutation rate and swaps per mutation (None: the default) of this generation"""
+        if self.adaptation is None:
+            return self.mutation_rate, None
+        return self.adaptation.mutation_rate(self.mutation_rate), self.adaptation.mutation_swaps(self.N)
+
+    def _adapt(self):
+        """Report the generation to the adaptive controller and carry out its restart or injection"""
+        if self.adaptation is None:
+            return
+        fitnesses = self.get_fitnesses()
+        action = self.adaptation.observe(fitnesses, self.population, self.boards)
+        if action is not None:
+            with PROFILER.phase("adaptation"):
+                count = self.adaptation.replacement_count(action, len(self.population))
+                self.population = replace_worst(self.population, fitnesses, count)
+                self._pack()
+            self.evaluations += count
+
     def evaluate_population(self):
         new_population = []
 
         if self.state != 2:
             # elitism
-            alit = self.get_best_chromosomes(self.elitism)
-            for i in alit:
-                new_population.append(i)
+            with PROFILER.phase("elitism"):
+                alit = self.get_best_chromosomes(self.elitism)
+            new_population.extend(alit)
 
         # regular/darwin/lamarck atate
+        learned_fitnesses = None
         if self.state != 0:
-            copy_population = [chrom.clone() for chrom in self.population]
-            for i in range(len(copy_population)):
-                self.population[i].local_optimize()
+            # darwin: the learned fitness only steers selection,
+            # lamarck: the learned boards are inherited as well
+            learned_fitnesses = optimize_population(self.population, self.boards, write_back=(self.state == 2),
+                                                    method=self.local_search, budget=self.local_search_budget)
         if self.state == 2:
             # elitism
-            alit = self.get_best_chromosomes(self.elitism)
-            for i in alit:
-                new_population.append(i)
+            with PROFILER.phase("elitism"):
+                alit = self.get_best_chromosomes(self.elitism)
+            new_population.extend(alit)
 
         # crossover
-        parets = []
         num_children = int(self.size * (1 - self.elitism))
-        for i in range(num_children):
-            parent1 = self.select_parent()
-            parent2 = self.select_parent()
-            parets.append((parent1, parent2))
+        with PROFILER.phase("selection"):
+            parets = self.select_parents(num_children, learned_fitnesses)
 
-        if self.state == 1:
-            self.population = copy_population
+        # all children of the generation in one batch
+        with PROFILER.phase("crossover"):
+            children = cross_over_pairs(parets, self.crossover)
 
-        for i in range(num_children):
-            parent1, parent2 = parets[i]
-            child = parent1.cross_over(parent2)
-            new_population.append(child)
-        
-        
+        # mutation; the elites are carried over unchanged
+        mutation_rate, swaps = self._mutation_intensity()
+        with PROFILER.phase("mutation"):
+            for child in children:
+                if random.random() < mutation_rate:
+                    child.mutate(swaps)
+        new_population.extend(children)
+        self.evaluations += len(children)
 
-        # mutation
-        for i in range(len(new_population)):
-            if random.random() < self.mutation_rate:
-                new_population[i].mutate()
+        if self.symmetry_index is not None:
+            with PROFILER.phase("deduplicate"):
+                self.symmetry_index.deduplicate(new_population)
 
         # update population
         self.population = new_population
-        self.generation += 1
\ No newline at end of file
+        with PROFILER.phase("pack"):
+            self._pack()
+        self._adapt()
+        self.generation += 1
+        if self.checkpoint_every and self.generation % self.checkpoint_every == 0:
+            with PROFILER.phase("checkpoint"):
+                save_checkpoint(self, self.checkpoint_path)
+        if PROFILER.enabled:
+            PROFILER.end_generation(self.generation)
+
+    def run(self, stop=None, diversity=True):
+        """
+        Evolves one generation per step and yields its statistics until a
+        stop condition fires, see streaming.run_manager.
+        """
+        return run_manager(self, stop, diversity)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from profiling import PROFILER
+
+
+def pack_population(population):
+    """
+    Copies the boards of a population into one contiguous (P, n, n) array.
+
+    Every chromosome's square is rebound to its slice of the new array, so
+    the chromosome objects stay usable as thin views while the population
+    can be evaluated as a single tensor. Cached fitness values and line sums
+    survive the move since the boards themselves do not change.
+    """
+    boards = np.stack([chrom.square for chrom in population])
+    for i, chrom in enumerate(population):
+        chrom.rebind_square(boards[i])
+    return boards
+
+
+def population_fitness(population, boards=None):
+    """
+    Returns the fitness of every chromosome in the population as an array.
+
+    Only chromosomes without a cached fitness are evaluated. When the
+    population has been packed into ``boards`` those are scored with one
+    batched kernel, otherwise each chromosome computes its own fitness.
+    """
+    if boards is None:
+        return np.array([chrom.get_fitness() for chrom in population])
+
+    cached = [chrom.get_cached_fitness() for chrom in population]
+    stale = [i for i, fitness in enumerate(cached) if fitness is None]
+    if stale:
+        if PROFILER.enabled:
+            PROFILER.count("fitness_evaluations", len(stale))
+        fresh = type(population[0]).batch_fitness(boards[stale])
+        for i, fitness in zip(stale, fresh):
+            population[i].set_cached_fitness(fitness)
+            cached[i] = fitness
+    return np.array(cached)
+
+
+def population_diversity(boards):
+    """
+    Returns the mean pairwise cell difference of a (P, n, n) stack: the
+    probability that two randomly drawn boards hold different numbers in a
+    random cell (0 for a converged population, close to 1 for random
+    permutations). Computed from per-cell value counts in O(P n^2).
+    """
+    boards = np.asarray(boards)
+    num_boards, n = len(boards), boards.shape[-1]
+    if num_boards < 2:
+        return 0.0
+    cells = n * n
+    flat = boards.reshape(num_boards, cells).astype(np.int64)
+    counts = np.bincount((np.arange(cells) * (cells + 1) + flat).ravel(), minlength=cells * (cells + 1))
+    # pairs (i != j) that agree on a cell, summed over the cells
+    agreeing = (counts * (counts - 1)).sum()
+    return float(1 - agreeing / (cells * num_boards * (num_boards - 1)))
@@ -0,0 +1,133 @@
+import numpy as np
+
+THUMBNAIL_TAG = "thumbnail"
+
+
+class _Slot:
+    """Canvas items of one on-screen thumbnail and what they currently show"""
+    __slots__ = ("tag", "cells_tag", "texts", "index", "board", "color", "hidden")
+
+    def __init__(self, tag, texts):
+        self.tag = tag
+        self.cells_tag = tag + "-cells"
+        self.texts = texts
+        self.index = 0
+        self.board = None
+        self.color = None
+        self.hidden = True
+
+
+class PopulationGrid:
+    """
+    Scrollable grid of board thumbnails drawn straight onto one tk.Canvas.
+
+    Only the rows inside the viewport own canvas items. They come from a
+    fixed pool of slots (one viewport plus one row) that are moved with
+    canvas.move() and updated with itemconfig() instead of being recreated,
+    and a slot only touches the numbers and colour that changed since it
+    was last drawn, so an unchanged board costs no Tk calls at all. Call
+    render() again after scrolling or resizing the canvas.
+    """
+
+    def __init__(self, canvas, board_size=60, pad=10, font_size=10):
+        self.canvas = canvas
+        self.board_size = board_size
+        self.pad = pad
+        self.font_size = font_size
+        self.boards = None
+        self.colors = []
+        self._slots = []
+        self._cols = 0
+        self._n = 0
+
+    def set_population(self, boards, colors):
+        """Shows a (P, n, n) stack of boards, thumbnail i filled with colors[i]"""
+        self.boards = np.asarray(boards)
+        self.colors = colors
+        self.render()
+
+    def clear(self):
+        """Deletes every thumbnail item, e.g. to use the canvas for something else"""
+        self.canvas.delete(THUMBNAIL_TAG)
+        self._slots = []
+        self.boards = None
+        self.colors = []
+
+    def _position(self, index):
+        row, col = divmod(index, self._cols)
+        step = self.board_size + self.pad
+        return self.pad + col * step, self.pad + row * step
+
+    def _build_slots(self, count, n):
+        self.canvas.delete(THUMBNAIL_TAG)
+        cell_size = self.board_size / n
+        origin = self.pad
+        self._slots = []
+        for k in range(count):
+            tag = f"{THUMBNAIL_TAG}-{k}"
+            cells_tag = tag + "-cells"
+            # every slot starts hidden at the first thumbnail, render() moves it into place
+            self.canvas.create_rectangle(origin, origin, origin + self.board_size, origin + self.board_size,
+                                         outline="black", width=2,
+                                         state="hidden", tags=(THUMBNAIL_TAG, tag))
+            texts = []
+            for i in range(n):
+                for j in range(n):
+                    x, y = origin + j * cell_size, origin + i * cell_size
+                    self.canvas.create_rectangle(x, y, x + cell_size, y + cell_size, outline="gray",
+                                                 state="hidden", tags=(THUMBNAIL_TAG, tag, cells_tag))
+                    texts.append(self.canvas.create_text(x + cell_size / 2, y + cell_size / 2,
+                                                         font=("Arial", self.font_size, "bold"),
+                                                         state="hidden", tags=(THUMBNAIL_TAG, tag)))
+            self._slots.append(_Slot(tag, texts))
+        self._n = n
+
+    def _draw(self, slot, index):
+        if slot.index != index:
+            x0, y0 = self._position(slot.index)
+            x1, y1 = self._position(index)
+            self.canvas.move(slot.tag, x1 - x0, y1 - y0)
+            slot.index = index
+        if slot.hidden:
+            self.canvas.itemconfig(slot.tag, state="normal")
+            slot.hidden = False
+        color = self.colors[index]
+        if color != slot.color:
+            self.canvas.itemconfig(slot.cells_tag, fill=color)
+            slot.color = color
+        board = self.boards[index].ravel()
+        changed = range(len(board)) if slot.board is None else np.flatnonzero(slot.board != board)
+        for cell in changed:
+            self.canvas.itemconfig(slot.texts[cell], text=str(board[cell]))
+        slot.board = board.copy()
+
+    def render(self):
+        """Brings the thumbnails inside the current viewport up to date"""
+        if self.boards is None:
+            return
+        num_boards, n = len(self.boards), self.boards.shape[1]
+        step = self.board_size + self.pad
+        width = self.canvas.winfo_width()
+        cols = max(1, (width - self.pad) // step)
+        rows = -(-num_boards // cols)
+        self.canvas.configure(scrollregion=(0, 0, cols * step + self.pad, rows * step + self.pad))
+
+        view_height = max(1, self.canvas.winfo_height())
+        capacity = (view_height // step + 2) * cols
+        if cols != self._cols or n != self._n or len(self._slots) < capacity:
+            self._cols = cols
+            self._build_slots(capacity, n)
+        capacity = len(self._slots)
+
+        top = max(0.0, self.canvas.canvasy(0))
+        first = int(top // step) * cols
+        last = min(num_boards, first + capacity, (int((top + view_height) // step) + 1) * cols)
+        visible = set()
+        for index in range(first, last):
+            slot = self._slots[index % capacity]
+            self._draw(slot, index)
+            visible.add(index % capacity)
+        for k, slot in enumerate(self._slots):
+            if k not in visible and not slot.hidden:
+                self.canvas.itemconfig(slot.tag, state="hidden")
+                slot.hidden = True
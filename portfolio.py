@@ -0,0 +1,100 @@
+"""
+Portfolio mode: many independent GA runs in a process pool.
+
+Every run gets its own seed (and optionally its own strategy or
+hyperparameters). The first run that finds a perfect square sets a shared
+event, and every other run stops at its next generation, so the
+portfolio's time-to-solution is that of its fastest member.
+"""
+import multiprocessing as mp
+import random
+import time
+from itertools import cycle
+
+import numpy as np
+
+from population_management import populationManagement
+from SeparatePopulationManagement import IslandPopulationManagement
+
+MANAGERS = {"population": populationManagement, "islands": IslandPopulationManagement}
+
+# set in every pool worker by _init_worker
+_cancel = None
+
+
+def portfolio_configs(base, runs, seed=0, vary=None):
+    """
+    Returns runs copies of the manager settings in base, where run i gets
+    seed + i and, for every key of vary, the i-th entry of its list of
+    alternatives (cycling), e.g. vary={"state": [0, 2]}.
+    """
+    alternatives = {key: cycle(values) for key, values in (vary or {}).items()}
+    configs = []
+    for i in range(runs):
+        config = dict(base, seed=seed + i)
+        config.update({key: next(values) for key, values in alternatives.items()})
+        configs.append(config)
+    return configs
+
+
+def _init_worker(cancel):
+    global _cancel
+    _cancel = cancel
+
+
+def run_config(task):
+    """
+    Builds and evolves the manager of one (index, config, max_gens) task
+    inside a pool worker and returns (index, result).
+    """
+    # imported here, magicsquare imports this module for its CLI
+    from magicsquare import run
+
+    index, config, max_gens = task
+    settings = dict(config)
+    manager_cls = MANAGERS[settings.pop("manager", "population")]
+    seed = settings.pop("seed")
+    random.seed(seed)
+    np.random.seed(seed)
+    result = run(manager_cls(settings.pop("N"), settings.pop("size"), **settings), max_gens, cancel=_cancel)
+    result["cancelled"] = not result["solved"] and result["generation"] < max_gens
+    result["config"] = config
+    return index, result
+
+
+def run_portfolio(configs, max_gens, processes=None, timeout=None):
+    """
+    Evolves every config of a portfolio in a pool of processes (one per core
+    by default) until one of them is solved, all of them reach max_gens or
+    timeout seconds have passed.
+
+    A config holds the constructor arguments of a manager, including N and
+    size, plus "seed" and optionally "manager" ("population" or "islands").
+    Returns {"winner", "runs", "elapsed"}: the run statistics of every
+    config in order (see magicsquare.run) and the index of the first
+    solved run, or of the best one if none was solved.
+    """
+    start = time.perf_counter()
+    context = mp.get_context()
+    cancel = context.Event()
+    results = [None] * len(configs)
+    winner = None
+    with context.Pool(processes, initializer=_init_worker, initargs=(cancel,)) as pool:
+        pending = pool.imap_unordered(run_config, [(i, config, max_gens) for i, config in enumerate(configs)])
+        for _ in configs:
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            try:
+                index, result = pending.next(timeout=remaining)
+            except mp.TimeoutError:
+                # stop every run and still collect what they reached
+                cancel.set()
+                timeout = None
+                index, result = pending.next()
+            results[index] = result
+            if result["solved"] and winner is None:
+                winner = index
+                cancel.set()
+
+    if winner is None:
+        winner = min(range(len(results)), key=lambda i: results[i]["fitness"])
+    return {"winner": winner, "runs": results, "elapsed": time.perf_counter() - start}
@@ -0,0 +1,114 @@
+import json
+import time
+
+
+class _NullPhase:
+    """Context manager handed out while profiling is disabled"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """Adds the wall time of a with-block to one phase of a Profiler"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """
+    Phase timers and operation counters for the GA loop.
+
+    The managers wrap every phase of a generation in ``with PROFILER.phase(name)``
+    and the chromosomes bump counters behind an ``if PROFILER.enabled`` check,
+    so a disabled profiler costs one attribute test per hook.
+
+    Phases: elitism, clone, local_optimize, selection, crossover, mutation,
+    deduplicate, adaptation, pack, migration and checkpoint. Counters:
+    fitness_evaluations, swaps_attempted, swaps_accepted,
+    chromosomes_allocated and duplicates_replaced.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.sink = None
+        self.reset()
+
+    def enable(self, sink=None):
+        """
+        Starts collecting. If sink is a writable text file, end_generation()
+        writes one JSON line per generation with that generation's numbers.
+        """
+        self.enabled = True
+        self.sink = sink
+
+    def disable(self):
+        self.enabled = False
+        self.sink = None
+
+    def reset(self):
+        """Clears every timer and counter"""
+        self.seconds = {}
+        self.calls = {}
+        self.counters = {}
+        self._mark = self._totals()
+
+    def phase(self, name):
+        """Returns a context manager that times one run of the named phase"""
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def add_time(self, name, seconds):
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _totals(self):
+        return dict(self.seconds), dict(self.counters)
+
+    def snapshot(self):
+        """
+        Returns the totals since the last reset as a JSON-ready dict:
+        {"phases": {name: {"seconds", "calls"}}, "counters": {name: count}}
+        """
+        return {
+            "phases": {name: {"seconds": seconds, "calls": self.calls[name]}
+                       for name, seconds in self.seconds.items()},
+            "counters": dict(self.counters),
+        }
+
+    def end_generation(self, generation):
+        """Writes what happened since the previous call to the sink, if any"""
+        seconds, counters = self._totals()
+        if self.sink is not None:
+            last_seconds, last_counters = self._mark
+            record = {
+                "generation": generation,
+                "phases": {name: value - last_seconds.get(name, 0.0) for name, value in seconds.items()},
+                "counters": {name: value - last_counters.get(name, 0) for name, value in counters.items()},
+            }
+            self.sink.write(json.dumps(record) + "\n")
+        self._mark = seconds, counters
+
+
+# the profiler every manager and chromosome reports to
+PROFILER = Profiler()
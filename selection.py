@@ -0,0 +1,86 @@
+import numpy as np
+
+
+def _selection_weights(fitnesses):
+    """
+    Turns fitness values (lower is better) into non-negative roulette
+    weights: each chromosome weighs as much as it beats the worst one.
+    Falls back to uniform weights when the whole population is equal.
+    """
+    fitnesses = np.asarray(fitnesses, dtype=float)
+    weights = fitnesses.max() - fitnesses
+    if weights.sum() <= 0:
+        return np.ones(len(fitnesses))
+    return weights
+
+
+def _spin(cumulative, pointers):
+    # first slot whose cumulative weight passes the pointer; zero-weight
+    # slots are never hit, the clip only guards float round-off at the end
+    idx = np.searchsorted(cumulative, pointers, side="right")
+    return np.minimum(idx, len(cumulative) - 1)
+
+
+def roulette_selection(fitnesses, count):
+    """
+    Draws ``count`` indices by roulette wheel with independent spins.
+    """
+    cumulative = np.cumsum(_selection_weights(fitnesses))
+    return _spin(cumulative, np.random.random(count) * cumulative[-1])
+
+
+def sus_selection(fitnesses, count):
+    """
+    Draws ``count`` indices by stochastic universal sampling: one spin and
+    ``count`` evenly spaced pointers, so every chromosome is picked within
+    one of its expected number of times.
+    """
+    cumulative = np.cumsum(_selection_weights(fitnesses))
+    step = cumulative[-1] / count
+    pointers = (np.random.random() + np.arange(count)) * step
+    idx = _spin(cumulative, pointers)
+    # pointers come out in population order, shuffle so pairs are random
+    np.random.shuffle(idx)
+    return idx
+
+
+def tournament_selection(fitnesses, count, tournament_size=3):
+    """
+    Draws ``count`` indices by k-way tournaments: each pick is the fittest
+    of ``tournament_size`` chromosomes sampled with replacement.
+    """
+    fitnesses = np.asarray(fitnesses)
+    contestants = np.random.randint(0, len(fitnesses), size=(count, tournament_size))
+    winners = fitnesses[contestants].argmin(axis=1)
+    return contestants[np.arange(count), winners]
+
+
+SELECTION_METHODS = {
+    "roulette": roulette_selection,
+    "sus": sus_selection,
+    "tournament": tournament_selection,
+}
+
+
+def check_selection(method):
+    """
+    Raises ValueError for an unknown selection method name.
+    """
+    if method not in SELECTION_METHODS:
+        raise ValueError(f"Unknown selection {method!r}, expected one of {sorted(SELECTION_METHODS)}.")
+
+
+def select_parent_pairs(fitnesses, num_pairs, method="roulette", tournament_size=3):
+    """
+    Draws all parent pairs of a generation at once from one fitness vector.
+
+    Returns an int array of shape (num_pairs, 2) holding population indices.
+    """
+    count = 2 * num_pairs
+    if count == 0:
+        return np.empty((0, 2), dtype=int)
+    if method == "tournament":
+        idx = tournament_selection(fitnesses, count, tournament_size)
+    else:
+        idx = SELECTION_METHODS[method](fitnesses, count)
+    return idx.reshape(num_pairs, 2)
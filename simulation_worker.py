@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from streaming import GenerationLimit, TargetFitness
+
+
+class SimulationWorker(threading.Thread):
+    """
+    Background thread that evolves a population manager at full speed and
+    publishes snapshots for a GUI to sample.
+
+    A snapshot is a dict with the generation, the boards and fitnesses of
+    the whole population sorted best first, the best and mean fitness of
+    every generation since the previous snapshot (so sampled curves have no
+    gaps), and "done"/"solved" flags. At most one snapshot waits in
+    self.snapshots, and a new one is only assembled after min_interval
+    seconds and once the previous one was taken, so a slow or absent reader
+    never slows the GA down. The manager must not be touched by any other
+    thread while the worker runs.
+    """
+
+    def __init__(self, manager, max_gens=None, min_interval=1 / 30):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.max_gens = max_gens
+        self.min_interval = min_interval
+        self.snapshots = queue.Queue(maxsize=1)
+        self._stop_event = threading.Event()
+        self._best_history = []
+        self._avg_history = []
+
+    def stop(self):
+        """Asks the worker to finish after the current generation"""
+        self._stop_event.set()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def _snapshot(self, done):
+        fitnesses = self.manager.get_fitnesses()
+        order = np.argsort(fitnesses, kind="stable")
+        population = self.manager.get_population()
+        snapshot = {
+            "generation": self.manager.get_generation(),
+            "boards": np.stack([population[i].get_square() for i in order]),
+            "fitnesses": fitnesses[order],
+            "best_history": self._best_history,
+            "avg_history": self._avg_history,
+            "done": done,
+            "solved": bool(fitnesses[order[0]] == 0),
+        }
+        self._best_history = []
+        self._avg_history = []
+        return snapshot
+
+    def run(self):
+        stop = [TargetFitness()]
+        if self.max_gens is not None:
+            stop.append(GenerationLimit(self.max_gens))
+        last_publish = 0.0
+        for stats in self.manager.run(stop, diversity=False):
+            self._best_history.append(stats["best"])
+            self._avg_history.append(stats["mean"])
+            if stats["stop"] is not None:
+                # the last snapshot must arrive, so wait until the reader takes the previous one
+                snapshot = self._snapshot(done=True)
+                while not self._stop_event.is_set():
+                    try:
+                        self.snapshots.put(snapshot, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                return
+            now = time.perf_counter()
+            if now - last_publish >= self.min_interval and not self.snapshots.full():
+                self.snapshots.put_nowait(self._snapshot(done=False))
+                last_publish = now
+            if self._stop_event.is_set():
+                return
@@ -0,0 +1,132 @@
+"""
+Generator-style driver for the population managers.
+
+manager.run(stop) evolves one generation per step and yields a small dict
+of statistics after each one, so callers can watch, log or abandon a run
+without polling the population themselves. A stop condition is any
+callable taking those statistics and returning True when the run should
+end; the ones below cover the usual criteria and can be combined freely
+(the run ends at the first that fires, named in stats["stop"] by its
+reason attribute, or by its __name__ for a plain function).
+"""
+import time
+
+import numpy as np
+
+from population_tensor import population_diversity
+
+
+class TargetFitness:
+    """Stops once the best fitness reaches target (0 is a perfect square)"""
+    reason = "target"
+
+    def __init__(self, target=0):
+        self.target = target
+
+    def __call__(self, stats):
+        return stats["best"] <= self.target
+
+
+class GenerationLimit:
+    """Stops once the manager's generation counter reaches generations"""
+    reason = "generations"
+
+    def __init__(self, generations):
+        self.generations = generations
+
+    def __call__(self, stats):
+        return stats["generation"] >= self.generations
+
+
+class Stagnation:
+    """
+    Stops when the best fitness has not improved for generations
+    consecutive generations. Keeps state, so use one instance per run.
+    """
+    reason = "stagnation"
+
+    def __init__(self, generations):
+        self.generations = generations
+        self.best = None
+        self.since = 0
+
+    def __call__(self, stats):
+        if self.best is None or stats["best"] < self.best:
+            self.best = stats["best"]
+            self.since = 0
+        else:
+            self.since += 1
+        return self.since >= self.generations
+
+
+class TimeBudget:
+    """Stops once seconds of wall-clock time have passed since run() started"""
+    reason = "time"
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, stats):
+        return stats["elapsed"] >= self.seconds
+
+
+class EvaluationBudget:
+    """Stops once evaluations individuals have been created since run() started"""
+    reason = "evaluations"
+
+    def __init__(self, evaluations):
+        self.evaluations = evaluations
+
+    def __call__(self, stats):
+        return stats["evaluations"] >= self.evaluations
+
+
+def generation_stats(manager, diversity=True):
+    """
+    Returns the statistics of the manager's current population:
+    generation, best, mean and worst fitness, a copy of the best board and
+    the population diversity (see population_diversity, None if disabled).
+    """
+    population = manager.get_population()
+    fitnesses = manager.get_fitnesses()
+    best = int(fitnesses.argmin())
+    boards = None
+    if diversity:
+        # the tensor engine already holds the boards in contiguous arrays
+        boards = manager.get_boards()
+        if boards is None:
+            boards = np.stack([chrom.square for chrom in population])
+    return {
+        "generation": manager.get_generation(),
+        "best": fitnesses[best].item(),
+        "mean": float(fitnesses.mean()),
+        "worst": fitnesses.max().item(),
+        "board": population[best].get_square().copy(),
+        "diversity": population_diversity(boards) if boards is not None else None,
+    }
+
+
+def run_manager(manager, stop=None, diversity=True):
+    """
+    Generator behind manager.run(): evolves one generation per step and
+    yields generation_stats() plus "elapsed" seconds and "evaluations"
+    (individuals created) since the start and "stop", the reason of the
+    condition that ended the run or None. stop defaults to
+    [TargetFitness()]; with an empty list the run goes on until the caller
+    stops iterating.
+    """
+    conditions = [TargetFitness()] if stop is None else list(stop)
+    start = time.perf_counter()
+    start_evaluations = manager.evaluations
+    while True:
+        manager.evaluate_population()
+        stats = generation_stats(manager, diversity)
+        stats["elapsed"] = time.perf_counter() - start
+        stats["evaluations"] = manager.evaluations - start_evaluations
+        # every condition sees every generation, stateful ones depend on it
+        fired = [getattr(condition, "reason", getattr(condition, "__name__", "custom"))
+                 for condition in conditions if condition(stats)]
+        stats["stop"] = fired[0] if fired else None
+        yield stats
+        if fired:
+            return
@@ -0,0 +1,179 @@
+"""
+Hyperparameter sweeps over the GA settings.
+
+Every configuration of a grid (or of a random sample of a search space)
+runs once per seed in a process pool. Each finished run is appended to a
+JSON Lines results file as soon as it arrives, so an interrupted sweep
+loses at most the runs in flight; running the same sweep against the same
+file again skips every (configuration, seed, max_gens) cell already
+recorded there. summarize() turns the file into one row per configuration
+and generation limit with its success rate, median time-to-solution and
+generations per second.
+"""
+import json
+import multiprocessing as mp
+import os
+import random
+import statistics
+from itertools import product
+
+from portfolio import run_config
+
+# constructor arguments only IslandPopulationManagement takes
+ISLAND_PARAMS = ("num_islands", "topology", "emigrant_policy", "migration_interval", "migration_rate")
+
+
+def grid_space(space):
+    """Returns every combination of a {name: [values]} grid as a list of dicts"""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in product(*(space[name] for name in names))]
+
+
+def random_space(space, count, seed=0):
+    """
+    Returns count configurations drawn from a search space that maps names
+    to a list of choices or to a (low, high) tuple, sampled uniformly (as
+    integers when both bounds are integers).
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(count):
+        config = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    config[name] = rng.randint(low, high)
+                else:
+                    config[name] = rng.uniform(low, high)
+            else:
+                config[name] = rng.choice(values)
+        configs.append(config)
+    return configs
+
+
+def config_key(config):
+    return json.dumps(config, sort_keys=True)
+
+
+def cell_settings(base, configs):
+    """
+    Merges every config over base and returns the distinct settings. Cells
+    of the population manager drop the island-only arguments, so a sweep
+    over manager=population,islands can share one set of island settings.
+    """
+    settings, seen = [], set()
+    for config in configs:
+        setting = dict(base, **config)
+        if setting.get("manager", "population") == "population":
+            setting = {name: value for name, value in setting.items() if name not in ISLAND_PARAMS}
+        key = config_key(setting)
+        if key not in seen:
+            seen.add(key)
+            settings.append(setting)
+    return settings
+
+
+def load_results(path):
+    """Returns the run records of a results file; a line cut off by a crash is ignored"""
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def run_sweep(base, configs, seeds, max_gens, path, processes=None):
+    """
+    Runs every config (merged over the manager settings in base, which
+    holds N, size and optionally "manager" like a portfolio config) once
+    per seed for at most max_gens generations, appending one record per
+    run to path. Cells already in path with the same max_gens are skipped.
+    Returns summarize() of the whole file.
+    """
+    done = {(config_key(record["config"]), record["seed"]) for record in load_results(path)
+            if record.get("max_gens") == max_gens}
+    settings = cell_settings(base, configs)
+    tasks = [(i, dict(setting, seed=seed), max_gens)
+             for i, setting in enumerate(settings) for seed in seeds
+             if (config_key(setting), seed) not in done]
+
+    if tasks:
+        # a run killed mid-write leaves a partial line, start on a fresh one
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        else:
+            needs_newline = False
+        with mp.get_context().Pool(processes) as pool, open(path, "a") as out:
+            if needs_newline:
+                out.write("\n")
+            for index, result in pool.imap_unordered(run_config, tasks):
+                record = {key: value for key, value in result.items() if key not in ("board", "config", "cancelled")}
+                record["config"] = settings[index]
+                record["seed"] = result["config"]["seed"]
+                record["max_gens"] = max_gens
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    return summarize(load_results(path))
+
+
+def summarize(records):
+    """
+    Groups run records by configuration and generation limit and returns one
+    row per group: {"config", "max_gens", "runs", "success_rate",
+    "time_to_solution", "generations", "generations_per_sec"}, where
+    time_to_solution and generations are medians over all seeds counting
+    unsolved runs as infinite (None when most runs failed), best
+    configurations first.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault((config_key(record["config"]), record.get("max_gens")), []).append(record)
+    rows = []
+    for runs in groups.values():
+        times = [run["elapsed"] if run["solved"] else float("inf") for run in runs]
+        generations = [run["generation"] if run["solved"] else float("inf") for run in runs]
+        rates = [run["generations_per_sec"] for run in runs if run["generations_per_sec"] is not None]
+        median_time = statistics.median(times)
+        median_generations = statistics.median(generations)
+        rows.append({
+            "config": runs[0]["config"],
+            "max_gens": runs[0].get("max_gens"),
+            "runs": len(runs),
+            "success_rate": sum(run["solved"] for run in runs) / len(runs),
+            "time_to_solution": None if median_time == float("inf") else median_time,
+            "generations": None if median_generations == float("inf") else median_generations,
+            "generations_per_sec": statistics.fmean(rates) if rates else None,
+        })
+    rows.sort(key=lambda row: (-row["success_rate"], row["time_to_solution"] is None,
+                               row["time_to_solution"] or 0.0))
+    return rows
+
+
+def format_table(rows):
+    """Renders summarize() rows as a text table showing only the settings that differ"""
+    if not rows:
+        return "no results"
+    settings = [dict(row["config"], max_gens=row["max_gens"]) for row in rows]
+    names = sorted({name for setting in settings for name in setting
+                    if len({config_key(other.get(name)) for other in settings}) > 1})
+    header = names + ["runs", "success", "median s", "median gens", "gen/s"]
+    lines = []
+    for row, setting in zip(rows, settings):
+        cells = [str(setting.get(name)) for name in names]
+        cells += [str(row["runs"]), f"{row['success_rate']:.0%}",
+                  "-" if row["time_to_solution"] is None else f"{row['time_to_solution']:.3f}",
+                  "-" if row["generations"] is None else f"{row['generations']:g}",
+                  "-" if row["generations_per_sec"] is None else f"{row['generations_per_sec']:.1f}"]
+        lines.append(cells)
+    widths = [max(len(cell) for cell in column) for column in zip(header, *lines)]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(cells, widths))
+                     for cells in [header] + lines)
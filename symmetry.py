@@ -0,0 +1,118 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from profiling import PROFILER
+
+
+def symmetric_variants(boards):
+    """
+    Returns the (P, 16, n, n) stack of every board's symmetric twins: the
+    8 rotations and reflections, each also complemented (x -> n^2 + 1 - x).
+    All 16 have the same fitness, magic or most-perfect.
+    """
+    boards = np.asarray(boards)
+    n = boards.shape[-1]
+    rotations = [np.rot90(boards, k, axes=(1, 2)) for k in range(4)]
+    dihedral = np.stack(rotations + [np.flip(rotation, axis=2) for rotation in rotations], axis=1)
+    return np.concatenate([dihedral, (n * n + 1) - dihedral], axis=1)
+
+
+def canonical_boards(boards):
+    """
+    Returns the canonical form of every board in a (P, n, n) stack: the
+    lexicographically smallest (row-major) of its 16 symmetric twins.
+    """
+    boards = np.asarray(boards)
+    num_boards, n, _ = boards.shape
+    variants = symmetric_variants(boards).reshape(num_boards, 16, n * n)
+    candidates = np.ones((num_boards, 16), dtype=bool)
+    # the twins of a permutation usually differ in their first cells
+    for position in range(n * n):
+        column = np.where(candidates, variants[:, :, position], n * n + 1)
+        candidates &= column == column.min(axis=1, keepdims=True)
+        if (candidates.sum(axis=1) == 1).all():
+            break
+    choice = candidates.argmax(axis=1)
+    return variants[np.arange(num_boards), choice].reshape(num_boards, n, n)
+
+
+def canonical_keys(boards):
+    """Returns one hashable key per board, equal for symmetric twins"""
+    canonical = canonical_boards(boards)
+    return [board.tobytes() for board in canonical]
+
+
+class SymmetryIndex:
+    """
+    Canonical-form index that keeps a population free of duplicates and
+    symmetric twins, with a bounded memo of canonical board -> fitness.
+
+    The memo survives between generations (and is shared by all islands of
+    a manager), evicting the least recently used entries beyond capacity.
+    """
+
+    def __init__(self, capacity=100_000, max_tries=5):
+        self.capacity = capacity
+        self.max_tries = max_tries
+        self.memo = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """Returns the remembered fitness of a canonical key, or None"""
+        fitness = self.memo.get(key)
+        if fitness is None:
+            self.misses += 1
+            return None
+        self.memo.move_to_end(key)
+        self.hits += 1
+        return fitness
+
+    def remember(self, key, fitness):
+        self.memo[key] = fitness
+        self.memo.move_to_end(key)
+        if len(self.memo) > self.capacity:
+            self.memo.popitem(last=False)
+
+    def deduplicate(self, population):
+        """
+        Mutates every chromosome that duplicates (up to symmetry) one
+        earlier in the list until it is new or max_tries mutations were
+        made, so elites at the front are kept. Then fills every missing
+        fitness from the memo or one batched evaluation and remembers it.
+        Returns the number of chromosomes that were replaced.
+        """
+        if not population:
+            return 0
+        keys = canonical_keys(np.stack([chrom.square for chrom in population]))
+        seen = set()
+        replaced = 0
+        for i, chrom in enumerate(population):
+            tries = 0
+            while keys[i] in seen and tries < self.max_tries:
+                chrom.mutate()
+                keys[i] = canonical_keys(chrom.square[None])[0]
+                tries += 1
+            replaced += tries > 0
+            seen.add(keys[i])
+
+        stale = []
+        for i, chrom in enumerate(population):
+            fitness = chrom.get_cached_fitness()
+            if fitness is None:
+                fitness = self.lookup(keys[i])
+                if fitness is None:
+                    stale.append(i)
+                    continue
+                chrom.set_cached_fitness(fitness)
+            self.remember(keys[i], fitness)
+        if stale:
+            fresh = type(population[0]).batch_fitness(np.stack([population[i].square for i in stale]))
+            for i, fitness in zip(stale, fresh):
+                population[i].set_cached_fitness(fitness)
+                self.remember(keys[i], fitness)
+        if PROFILER.enabled:
+            PROFILER.count("duplicates_replaced", replaced)
+            PROFILER.count("fitness_evaluations", len(stale))
+        return replaced